@@ -0,0 +1,107 @@
+import threading
+import time
+
+import numpy as np
+
+from search_cache import SharedGeneration
+
+# past first-turn answers per rulebook qdrant collection
+# a question whose embedding has a cosine similarity of at least threshold
+# with a stored question gets the stored answer without calling the llm
+# answers expire after ttl seconds, invalidate() bumps a generation kept in
+# store (see SharedGeneration) so every worker drops the answers of the rulebook
+class SemanticAnswerCache:
+    def __init__(self, threshold=0.95, max_entries=1000, ttl=86400, store=None, prefix='answers:', generation_check=1.0, store_errors=()):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation_store = store
+        self.prefix = prefix
+        self.generation_check = generation_check
+        self.store_errors = store_errors
+        # collection name -> {'generation': ..., 'vectors': unit vectors matrix,
+        # 'expires': monotonic time per answer, 'answers': [...]}
+        self.collections = {}
+        # bumped for every rulebook at once and per rulebook
+        self.all_generation = SharedGeneration(store, prefix + 'generation', generation_check, store_errors)
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def rulebook_generation(self, collection_name):
+        with self.lock:
+            generation = self.generations.get(collection_name)
+            if generation == None:
+                generation = SharedGeneration(self.generation_store, self.prefix + collection_name + ':generation', self.generation_check, self.store_errors)
+                self.generations[collection_name] = generation
+            return generation
+
+    # the answers of collection_name are valid while this stays the same
+    def generation(self, collection_name):
+        return (self.all_generation.current(), self.rulebook_generation(collection_name).current())
+
+    def lookup(self, collection_name, vector):
+        query = unit_vector(vector)
+        generation = self.generation(collection_name)
+        now = time.monotonic()
+        with self.lock:
+            entries = self.collections.get(collection_name)
+            if entries != None and entries['generation'] != generation:
+                del self.collections[collection_name]
+                entries = None
+            if entries != None and query is not None and len(entries['answers']) != 0\
+                and entries['vectors'].shape[1] == query.shape[0]:
+                similarities = np.where(entries['expires'] > now, entries['vectors'] @ query, -np.inf)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    return entries['answers'][best]
+            self.misses += 1
+            return None
+
+    def store(self, collection_name, vector, answer):
+        vector = unit_vector(vector)
+        if vector is None:
+            return
+        generation = self.generation(collection_name)
+        with self.lock:
+            entries = self.collections.get(collection_name)
+            if entries == None or entries['generation'] != generation or entries['vectors'].shape[1] != vector.shape[0]:
+                entries = {'generation': generation, 'vectors': np.empty((0, vector.shape[0])), 'expires': np.empty(0), 'answers': []}
+                self.collections[collection_name] = entries
+            # oldest answers are dropped first
+            entries['vectors'] = np.vstack([entries['vectors'], vector])[-self.max_entries:]
+            entries['expires'] = np.append(entries['expires'], time.monotonic() + self.ttl)[-self.max_entries:]
+            entries['answers'] = (entries['answers'] + [answer])[-self.max_entries:]
+
+    # call when a rulebook is re-ingested, no name clears every rulebook
+    def invalidate(self, collection_name=None):
+        with self.lock:
+            if collection_name == None:
+                self.collections = {}
+            else:
+                self.collections.pop(collection_name, None)
+        if collection_name == None:
+            self.all_generation.bump()
+        else:
+            self.rulebook_generation(collection_name).bump()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'threshold': self.threshold,
+                'rulebooks': len(self.collections),
+                'answers': sum(len(entries['answers']) for entries in self.collections.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups != 0 else 0.0
+            }
+
+def unit_vector(vector):
+    vector = np.asarray(vector, dtype=np.float64)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return None
+    return vector / norm
@@ -1,22 +1,22 @@
 # flask imports
-from flask import Flask, request, jsonify, make_response
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, Response, request, jsonify, make_response, stream_with_context
 import uuid # for public id
 from  werkzeug.security import generate_password_hash, check_password_hash
 # imports for PyJWT authentication
 import jwt
 from datetime import datetime, timedelta, timezone
 from functools import wraps
+from collections import namedtuple
 
 from flask_cors import CORS
 import os
+import threading
 from dotenv import load_dotenv
 
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, NotFoundError
+from sqlalchemy.exc import IntegrityError
 import pandas as pd
 
-import random
-
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_google_genai import GoogleGenerativeAI
 from langchain.memory import ConversationBufferWindowMemory
@@ -25,91 +25,160 @@ from langchain_qdrant import QdrantVectorStore
 
 from build_filter import build_filter_min_age, build_filter_min_players, build_filter_max_players, build_filter_match
 from build_filter import build_filter_min_playtime, build_filter_max_playtime, build_filter_min_year, build_filter_max_year
-from pick_filter import pick_filter_min_age, pick_filter_min_playtime, pick_filter_max_playtime
-from pick_filter import pick_filter_min_players, pick_filter_max_players
+from pick_engine import pick_games, pick_from_catalog
+from game_lookup import get_games_by_ids, hydrate_games, like_documents, MLT_FIELDS
+from catalog import GameCatalog
+from game_vectors import GAME_VECTORS_PATH, load_game_vectors, vector_hits
+from similar_games import SIMILAR_GAMES_PATH, build_similar_query, load_similar_games, similar_hits
+from facets import build_facets, build_facet_aggs, read_facet_aggs
+from search_projection import parse_fields, build_source, project_hits
+from search_cache import SearchCache, SharedGeneration, search_cache_key
+from search_cursor import CURSOR_KEEP_ALIVE, decode_cursor, build_cursor_args, next_cursor
+from rag_pool import RetrieverPool
+from chat_stream import stream_answer, sse_event
+from embedding_cache import CachedEmbeddings
+from answer_cache import SemanticAnswerCache
+from principal_cache import PrincipalCache, to_principal, invalidate_on_change
+from migrations import migrate
+from db_routing import REPLICA_BIND, engine_options, read_only, pool_stats
+from models import db, User, Collection, CollectionItem, ChatHistory, ChatMessage, Rulebook
+from queries import get_collection_summaries, get_recent_messages, get_collections_with_game
+from queries import get_message_page, get_history_page, message_cursor, decode_message_cursor, history_cursor, decode_history_cursor
+from queries import MAX_BULK_ITEMS, add_collection_items, remove_collection_items
 
 load_dotenv(override=True)
 
 # creates Flask object
 app = Flask(__name__)
-CORS(app)
+# the next page of /get_all_history is in a header, the body stays a list
+CORS(app, expose_headers=['X-Next-Cursor'])
 # configuration
 # NEVER HARDCODE YOUR CONFIGURATION IN YOUR CODE
 # INSTEAD CREATE A .env FILE AND STORE IN IT
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
 # database name
 app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+mysqldb://'+os.environ.get('MYSQL_USERNAME')+':'+os.environ.get('MYSQL_PASSWORD')+'@'+os.environ.get('MYSQL_URL')+'/boardbuddy'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = True
-# creates SQLALCHEMY object
-db = SQLAlchemy(app)
+# model change events are not used, tracking them only slows every flush down
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# pool sizing and pre-ping, DB_POOL_SIZE etc., see engine_options
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(os.environ)
+# read_only routes query the replica when MYSQL_REPLICA_URL is set,
+# its pool is sized with DB_REPLICA_POOL_SIZE etc.
+if os.environ.get('MYSQL_REPLICA_URL'):
+    replica_options = engine_options(os.environ, 'DB_REPLICA_')
+    replica_options['url'] = 'mysql+mysqldb://'+os.environ.get('MYSQL_REPLICA_USERNAME', os.environ.get('MYSQL_USERNAME'))+':'+os.environ.get('MYSQL_REPLICA_PASSWORD', os.environ.get('MYSQL_PASSWORD'))+'@'+os.environ.get('MYSQL_REPLICA_URL')+'/boardbuddy'
+    app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: replica_options}
+# binds the SQLALCHEMY object
+db.init_app(app)
 
 app.es_client = Elasticsearch("https://localhost:9200", basic_auth=("elastic", os.environ.get('ELASTIC_KEY')), ca_certs="~/http_ca.crt")
-app.df = pd.read_parquet('bgg_games_info_cleaned.parquet.gzip')
+app.similar_games_path = os.environ.get('SIMILAR_GAMES_PATH', SIMILAR_GAMES_PATH)
+app.game_vectors_path = os.environ.get('GAME_VECTORS_PATH', GAME_VECTORS_PATH)
+
+# /search responses, the catalog and rulebook answer generations, shared between workers when a
+# redis url is configured, redis is an optional dependency (pip install redis)
+# only needed with SEARCH_CACHE_REDIS_URL, an unreachable redis is a cache miss
+if os.environ.get('SEARCH_CACHE_REDIS_URL'):
+    import redis
+    search_store = redis.Redis.from_url(os.environ.get('SEARCH_CACHE_REDIS_URL'))
+    search_store_errors = (redis.RedisError,)
+else:
+    search_store = None
+    search_store_errors = ()
+
+# everything built from the parquet file the bgg index is made of,
+# loaded at startup and again after es_indexer.py rebuilt the index
+# requests keep the old objects until all new ones are built
+def load_catalog():
+    df = pd.read_parquet('bgg_games_info_cleaned.parquet.gzip')
+    # id lookups are served from memory, elasticsearch is kept for searching
+    catalog = GameCatalog(df)
+    # facet counts over the whole catalog, computed once
+    facets = build_facets(df)
+    # recommendations precomputed by similar_games.py, None until it has been run
+    similar_games = load_similar_games(app.similar_games_path, catalog)
+    # game vectors from game_vectors.py, None keeps more_like_this for collections
+    game_vectors = load_game_vectors(app.game_vectors_path, catalog)
+    app.df, app.catalog, app.facets = df, catalog, facets
+    app.similar_games, app.game_vectors = similar_games, game_vectors
+
+# bumped by /invalidate_search, every worker reloads on its next request
+app.catalog_generation = SharedGeneration(search_store, 'catalog:generation', store_errors=search_store_errors)
+app.catalog_loaded = app.catalog_generation.current()
+app.catalog_lock = threading.Lock()
+load_catalog()
+
+@app.before_request
+def refresh_catalog():
+    generation = app.catalog_generation.current()
+    if generation == app.catalog_loaded:
+        return
+    with app.catalog_lock:
+        if generation != app.catalog_loaded:
+            load_catalog()
+            app.catalog_loaded = generation
+
+app.recommendation_clusters = int(os.environ.get('RECOMMENDATION_CLUSTERS', 1))
+
+# /search responses
+app.search_cache = SearchCache(
+    ttl=int(os.environ.get('SEARCH_CACHE_TTL', 300)),
+    max_size=int(os.environ.get('SEARCH_CACHE_SIZE', 1000)),
+    store=search_store,
+    store_errors=search_store_errors
+)
 
 # embedding
-app.embeddings = OllamaEmbeddings(model='nomic-embed-text', base_url=os.environ.get('EMBEDDED_URL')) 
+# repeated questions are answered from the local cache instead of the embedding server
+app.embeddings = CachedEmbeddings(
+    OllamaEmbeddings(model='nomic-embed-text', base_url=os.environ.get('EMBEDDED_URL')),
+    model='nomic-embed-text',
+    path=os.environ.get('EMBEDDING_CACHE_PATH', 'embedding_cache.sqlite3')
+)
 # qdrant
 app.qdrant_url = os.environ.get('QDRANT_URL')
 # llm
 app.llm = GoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=os.environ["GOOGLE_API_KEY_GEN"])
 
-# Database ORMs
-class User(db.Model):
-    __tablename__ = "user"
-    id = db.Column(db.Integer, primary_key = True)
-    public_id = db.Column(db.String(50), unique = True, nullable=False)
-    username = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(70), unique = True, nullable=False)
-    password = db.Column(db.Text(), nullable=False)
-    roles = db.Column(db.String(100), nullable=False)
-    collections = db.relationship('Collection', backref='user', lazy=True, cascade="all,delete")
-    chats = db.relationship('ChatHistory', backref='user', lazy=True, cascade="all,delete")
-
-class Collection(db.Model):
-    __tablename__ = "collection"
-    id = db.Column(db.Integer, primary_key = True)
-    public_id = db.Column(db.String(50), unique = True, nullable=False)
-    name = db.Column(db.String(100), nullable=False)
-    user_id = db.Column(db.String(50), db.ForeignKey('user.public_id'), nullable=False)
-    boardgames = db.relationship('CollectionItem', backref='collection', lazy=True, cascade="all,delete")
-
-class CollectionItem(db.Model):
-    __tablename__ = "item"
-    # id = db.Column(db.Integer, primary_key = True)
-    bg_id = db.Column(db.Integer, nullable=False)
-    public_id = db.Column(db.String(50), unique = True, nullable=False)
-    collection_id = db.Column(db.String(50), db.ForeignKey('collection.public_id'), nullable=False)
-    __table_args__ = (
-        db.PrimaryKeyConstraint(
-            bg_id, collection_id,
-        ),
+# first-turn answers per rulebook, reused for near identical questions
+app.answers = SemanticAnswerCache(
+    threshold=float(os.environ.get('ANSWER_CACHE_THRESHOLD', 0.95)),
+    max_entries=int(os.environ.get('ANSWER_CACHE_SIZE', 1000)),
+    ttl=int(os.environ.get('ANSWER_CACHE_TTL', 86400)),
+    store=search_store,
+    store_errors=search_store_errors
+)
+
+# qdrant retriever for one rulebook collection
+def build_retriever(collection_name):
+    qdrant = QdrantVectorStore.from_existing_collection(
+        embedding=app.embeddings,
+        collection_name=collection_name,
+        url=app.qdrant_url,
+        api_key=os.environ["QDRANT_KEY"],
     )
-
-class ChatHistory(db.Model):
-    __tablename__ = "history"
-    id = db.Column(db.Integer, primary_key = True)
-    public_id = db.Column(db.String(50), unique = True, nullable=False)
-    user_id = db.Column(db.String(50), db.ForeignKey('user.public_id'), nullable=False)
-    name = db.Column(db.String(100), nullable=False)
-    game = db.Column(db.Integer, nullable=False)
-    chats = db.relationship('ChatMessage', backref='history', lazy=True, cascade="all,delete")
-
-class ChatMessage(db.Model):
-    __tablename__ = "message"
-    id = db.Column(db.Integer, primary_key = True)
-    public_id = db.Column(db.String(50), unique = True, nullable=False)
-    chat_id = db.Column(db.String(50), db.ForeignKey('history.public_id'), nullable=False)
-    is_human = db.Column(db.Boolean, nullable=False)
-    date = db.Column(db.DateTime, nullable=False)
-    message = db.Column(db.Text, nullable=False)
-
-class Rulebook(db.Model):
-    __tablename__ = "rulebook"
-    id = db.Column(db.Integer, primary_key = True)
-    name = db.Column(db.String(50), nullable=False)
-    qdrant = db.Column(db.String(50), nullable=False)
-    image = db.Column(db.Text, nullable=False)
-    link = db.Column(db.Text)
+    return qdrant.as_retriever()
+
+# retrievers are reused across messages instead of reconnecting every time
+app.retrievers = RetrieverPool(build_retriever, max_size=int(os.environ.get('RETRIEVER_POOL_SIZE', 16)))
+
+# authenticated users are kept for a short time so protected routes skip the user query
+# invalidations reach every worker through the shared store, role changes made
+# outside the app (plain SQL) take up to PRINCIPAL_CACHE_TTL seconds
+app.principals = PrincipalCache(
+    ttl=int(os.environ.get('PRINCIPAL_CACHE_TTL', 5)),
+    store=search_store,
+    store_errors=search_store_errors
+)
+invalidate_on_change(app.principals, User)
+
+def load_principal(public_id):
+    user = User.query\
+        .filter_by(public_id = public_id)\
+        .first()
+    if not user:
+        return None
+    return to_principal(user)
 
 # decorator for verifying the JWT
 def token_required(f):
@@ -127,9 +196,7 @@ def token_required(f):
         try:
             # decoding the payload to fetch the stored details
             data = jwt.decode(token, app.config['SECRET_KEY'], algorithms="HS256")
-            current_user = User.query\
-                .filter_by(public_id = data['public_id'])\
-                .first()
+            current_user = app.principals.get(data['public_id'], load_principal)
         except:
             return jsonify({
                 'message' : 'Token is invalid !!'
@@ -163,52 +230,62 @@ def get_all_users(current_user):
 
 # route for getting collections by user_id
 @app.route('/get_collections_by_user_id', methods =['POST'])
+@read_only
 def get_collections_by_user_id():
     # creates dictionary of form data
     req = request.json
   
-    collections = Collection.query\
-        .filter_by(user_id = req.get('user_id'))\
-        .all()
-  
+    # one query for the counts and thumbnail ids of every collection
+    summaries = get_collection_summaries(req.get('user_id'))
+
+    # one lookup for every thumbnail on the page
+    games = get_games_by_ids(app.es_client, [bg_id for summary in summaries for bg_id in summary['bg_ids']], source=['image'], catalog=app.catalog)
+
     output = []
-    for collection in collections:
-        game_count = 0
-        thumbnail = []
-    
-        items = CollectionItem.query\
-            .filter_by(collection_id = collection.public_id)\
-            .all()
-  
-        for item in items:
-            if game_count <= 2:
-                content = app.es_client.search(index='bgg', query={
-                        "constant_score" : { 
-                                "filter" : {
-                                    "term" : { 
-                                        "id" : item.bg_id
-                                    }
-                                }
-                            }
-                    })['hits']['hits']
-                if len(content) != 0:
-                    item_content = content[0]["_source"]
-                    thumbnail.append(item_content['image'])
-            game_count = game_count + 1
-            
+    for summary in summaries:
         # append 
         # to the response list
         output.append({
-            'name': collection.name,
-            'public_id': collection.public_id,
-            'game_count': game_count,
-            'thumbnail': thumbnail
+            'name': summary['name'],
+            'public_id': summary['public_id'],
+            'game_count': summary['game_count'],
+            'thumbnail': [games[bg_id]['_source']['image'] for bg_id in summary['bg_ids'] if bg_id in games]
         })
   
     return jsonify(output)
 
+# recommendations for the games of a collection, nearest game vectors when
+# they are loaded, otherwise more_like_this over hits, the found games of bg_ids
+def collection_recommendations(bg_ids, hits):
+    rec_list = vector_hits(app.game_vectors, app.catalog, bg_ids, clusters=app.recommendation_clusters)
+    if rec_list != None:
+        return rec_list
+    es_id = like_documents(hits, app.catalog)
+    if len(es_id) == 0:
+        return []
+    return app.es_client.search(index='bgg', query={
+        "bool": {
+            "must": {
+                "more_like_this": {
+                    "fields": MLT_FIELDS,
+                    "like": es_id,
+                    "min_term_freq": 1,
+                    "min_doc_freq": 5,
+                    "max_query_terms": 20
+                }
+            },
+            # artificial like documents do not exclude themselves
+            "must_not": {
+                "terms": {
+                    "id": bg_ids
+                }
+            }
+        }
+    })['hits']['hits']
+
 # route for getting collection items by public_id
 @app.route('/get_collection_by_public_id', methods =['POST'])
+@read_only
 def get_collection_by_public_id():
     # creates dictionary of form data
     req = request.json
@@ -224,41 +301,22 @@ def get_collection_by_public_id():
     if not collection or collection.user_id != req.get('user_id'):
         return jsonify({'message' : 'Collection not found'}), 404
     
-    es_id = []
+    bg_ids = [item.bg_id for item in items]
+    contents = hydrate_games(app.es_client, bg_ids, source=['id', 'name', 'image'], catalog=app.catalog)
+    rec_list = collection_recommendations(bg_ids, [content for content in contents if content != None])
+
     output = []
-    for item in items:
+    for item, content in zip(items, contents):
+        if content == None:
+            continue
         # append 
         # to the response list
-        content = app.es_client.search(index='bgg', query={
-                "constant_score" : { 
-                        "filter" : {
-                            "term" : { 
-                                "id" : item.bg_id
-                            }
-                        }
-                    }
-            })['hits']['hits'][0]
         output.append({
             'bg_id': item.bg_id,
             'public_id': item.public_id,
             'name': content["_source"]['name'],
             'image': content["_source"]['image'],
         })
-        es_id.append({
-            '_id': content['_id'],
-        })
-
-    rec_list = []
-    if len(es_id) != 0:
-        rec_list = app.es_client.search(index='bgg', query={
-                "more_like_this": {
-                    "fields": ["name", "description", "boardgame_subdomain"],
-                    "like": es_id,
-                    "min_term_freq": 1,
-                    "min_doc_freq": 5,
-                    "max_query_terms": 20
-            }
-        })['hits']['hits']
 
     rec_bg_list = []
     for i in rec_list:
@@ -332,33 +390,14 @@ def delete_collection():
 
 # route for getting collections by user_id
 @app.route('/get_collections_to_add', methods =['GET'])
+@read_only
 def get_collections_to_add():
     # creates dictionary of form data
     user_id = request.args.get('user_id')
     bg_id = request.args.get('bg_id')
 
-    collections = Collection.query\
-        .filter_by(user_id = user_id)\
-        .all()
-    
-    output = []
-    for collection in collections:
-        have = False
-        items = CollectionItem.query\
-            .filter_by(
-                bg_id = bg_id,
-                collection_id = collection.public_id
-            )\
-            .all()
-        
-        if len(items) != 0:
-            have = True
-
-        output.append({
-            'name': collection.name,
-            'public_id': collection.public_id,
-            'have': have
-        })
+    # one query for every collection and its have flag
+    output = get_collections_with_game(user_id, bg_id)
     
     response = {
         'collections': output,
@@ -424,6 +463,61 @@ def delete_item():
     db.session.commit()
     return make_response('delete item')
 
+# checks the body of /add_items and /delete_items
+# returns the collection and bg_ids, or an error response
+def bulk_items_request(data):
+    bg_ids = data.get('bg_ids')
+    if type(bg_ids) != list or len(bg_ids) == 0 or len(bg_ids) > MAX_BULK_ITEMS:
+        return None, None, (jsonify({'message' : 'bg_ids must be a list of 1 to ' + str(MAX_BULK_ITEMS) + ' ids'}), 400)
+
+    collection = Collection.query\
+        .filter_by(public_id = data.get('collection_id'))\
+        .first()
+
+    if not collection:
+        # returns 401 if collection does not exist
+        return None, None, make_response(
+            'Could not verify',
+            401,
+            {'WWW-Authenticate' : 'Basic realm ="Collection does not exist !!"'}
+        )
+    return collection, bg_ids, None
+
+# adds many games to a collection in one transaction
+# e.g. importing a whole shelf, with the outcome of every bg_id
+@app.route('/add_items', methods =['POST'])
+def add_items():
+    collection, bg_ids, error = bulk_items_request(request.json)
+    if error != None:
+        return error
+
+    try:
+        items = add_collection_items(collection.public_id, bg_ids)
+        db.session.commit()
+    except IntegrityError:
+        # the same game was added by a concurrent request
+        db.session.rollback()
+        return jsonify({'message' : 'Duplicated entry, retry the request'}), 409
+
+    return jsonify({
+        'added': sum(1 for item in items if item['status'] == 'added'),
+        'items': items
+    })
+
+# removes many games of a collection in one transaction
+@app.route('/delete_items', methods =['POST'])
+def delete_items():
+    collection, bg_ids, error = bulk_items_request(request.json)
+    if error != None:
+        return error
+
+    items = remove_collection_items(collection.public_id, bg_ids)
+    db.session.commit()
+    return jsonify({
+        'removed': sum(1 for item in items if item['status'] == 'removed'),
+        'items': items
+    })
+
 # route for logging user in
 @app.route('/login', methods =['POST'])
 def login():
@@ -540,6 +634,8 @@ def search_recipes():
         return jsonify({
                 'message' : 'query is required'
             }), 400
+    # same query with different spacing shares one cache entry
+    query_term = ' '.join(query_term.split())
     
     if size == None or len(size) == 0:
         size = 32
@@ -572,6 +668,12 @@ def search_recipes():
     bg_publisher = request.args.get('bgpb')
     #subdomain
     bg_subdomain = request.args.get('bgsd')
+    #facet counts for this query
+    facets = request.args.get('facets')
+    #returned fields, e.g. id,name,image,thumbnail for list views
+    fields = parse_fields(request.args.get('fields'), app.catalog.columns)
+    #cursor pagination instead of page, empty for the first page
+    cursor = request.args.get('cursor')
 
     filter_query = []
     build_filter_min_age(filter_query, min_age)
@@ -585,16 +687,13 @@ def search_recipes():
     match_query = []
     build_filter_match(match_query, bg_designer, bg_publisher, bg_subdomain)
 
-    results = any
-    if query_term == None or len(query_term) == 0:
-        results = app.es_client.search(index='bgg', query={
-                "bool":{
-                    "must": match_query,
-                    "filter": filter_query
-                }
-            }, suggest_field='name', suggest_text=query_term, suggest_mode='missing', from_=page, size=size)
-        
-    else:
+    search_args = {}
+    if facets != None and len(facets) != 0:
+        search_args['aggs'] = build_facet_aggs()
+    if fields != None:
+        search_args['source'] = build_source(fields)
+
+    if len(query_term) != 0:
         match_query.append({
             "multi_match" : {
                 "query" : query_term,
@@ -604,22 +703,62 @@ def search_recipes():
                 "fuzziness" : "AUTO",
             }
         })
-        results = app.es_client.search(index='bgg', query={
-                "bool":{
-                    "must": match_query,
-                    "filter": filter_query
-                }
-            }, suggest_field='name', suggest_text=query_term, suggest_mode='missing', from_=page, size=size)
+    query = {
+        "bool":{
+            "must": match_query,
+            "filter": filter_query
+        }
+    }
+
+    if cursor != None:
+        # search_after over a point in time, every page costs the same
+        try:
+            pit_id, search_after = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({
+                    'message' : 'cursor is invalid'
+                }), 400
+        if pit_id == None:
+            pit_id = app.es_client.open_point_in_time(index='bgg', keep_alive=CURSOR_KEEP_ALIVE)['id']
+        try:
+            results = app.es_client.search(query=query, suggest_field='name', suggest_text=query_term, suggest_mode='missing', size=size,
+                **build_cursor_args(pit_id, search_after), **search_args)
+        except NotFoundError:
+            return jsonify({
+                    'message' : 'cursor has expired'
+                }), 410
+        # elasticsearch may hand back a new point in time id
+        if 'pit_id' in results:
+            pit_id = results['pit_id']
+        response_object['cursor'] = next_cursor(pit_id, results['hits']['hits'], size)
+        if response_object['cursor'] == None:
+            # last page, the point in time is not needed anymore
+            app.es_client.close_point_in_time(id=pit_id)
+    else:
+        # popular queries and category links are answered from the cache
+        cache_key = search_cache_key(query, query_term, page, size, search_args)
+        cached = app.search_cache.get(cache_key)
+        if cached != None:
+            return cached
+
+        results = app.es_client.search(index='bgg', query=query, suggest_field='name', suggest_text=query_term, suggest_mode='missing', from_=page, size=size, **search_args)
         
     total_hit = results['hits']['total']['value']
-    results_df = pd.DataFrame([[hit['_source'][key] for key in hit['_source']] for hit in results['hits']['hits']], columns=list(app.df.columns))
-    results_df['_score'] = [hit['_score'] for hit in results['hits']['hits']]
     response_object['total_hit'] = total_hit
-    response_object['results'] = results_df.to_dict('records')
+    response_object['results'] = project_hits(results['hits']['hits'], fields or app.catalog.columns)
     response_object['suggest'] = results['suggest']
-    response_object['categories'] = app.df['boardgame_subdomain'].unique().tolist()
+    response_object['categories'] = app.facets['categories']
+    if 'aggregations' in results:
+        response_object['facets'] = read_facet_aggs(results['aggregations'])
+    if cursor == None:
+        app.search_cache.set(cache_key, response_object)
     return response_object
 
+# facet counts over the whole catalog for the initial filter sidebar
+@app.route('/facets', methods=['GET'])
+def get_facets():
+    return jsonify(app.facets)
+
 @app.route('/boardgame/<bg_id>', methods =['GET'])
 def get_bg_by_id(bg_id=0):
     try:
@@ -627,30 +766,13 @@ def get_bg_by_id(bg_id=0):
     except:
         return jsonify({'message' : 'bg_id must be a number'}), 400
     
-    bg = app.es_client.search(index='bgg', query={
-            "constant_score" : { 
-                    "filter" : {
-                        "term" : { 
-                            "id" : bg_id
-                        }
-                    }
-                }
-        })['hits']['hits']
+    bg = hydrate_games(app.es_client, [bg_id], catalog=app.catalog)[0]
     result = {}
-    if len(bg) != 0:
-        result = bg[0]["_source"]
-        es_id = bg[0]["_id"]
-        rec_list = app.es_client.search(index='bgg', size=4, query={
-            "more_like_this": {
-                "fields": ["name", "description", "boardgame_subdomain"],
-                "like": {
-                    "_id": es_id
-                },
-                "min_term_freq": 1,
-                "min_doc_freq": 5,
-                "max_query_terms": 20
-            }
-        })['hits']['hits']
+    if bg != None:
+        result = bg["_source"]
+        rec_list = similar_hits(app.similar_games, app.catalog, result['id'])
+        if rec_list == None:
+            rec_list = app.es_client.search(index='bgg', size=4, query=build_similar_query(like_documents([bg], app.catalog), result['id']))['hits']['hits']
         result["recommendation"] = rec_list
     else:
         return jsonify({'message' : 'Boardgame not found'}), 404
@@ -666,6 +788,11 @@ def random_pick():
     max_playtime = data.get('max_playtime')
     min_players = data.get('min_players')
     max_players = data.get('max_players')
+    # number of distinct games to pick
+    n = data.get('n', 1)
+
+    if type(n) != int or n < 1:
+        return jsonify({'message' : 'n must be a positive number'}), 400
 
     collection = Collection.query\
         .filter_by(public_id = collection_id)\
@@ -678,62 +805,70 @@ def random_pick():
     if not collection:
         return jsonify({'message' : 'Collection not found'}), 404
     
-    return_list = []
-    for item in items:
-        content = app.es_client.search(index='bgg', query={
-                "constant_score" : { 
-                        "filter" : {
-                            "term" : { 
-                                "id" : item.bg_id
-                            }
-                        }
-                    }
-            })['hits']['hits'][0]
-        return_list.append({
-            'bg_id': item.bg_id,
-            'public_id': item.public_id,
-            'name': content["_source"]['name'],
-            'image': content["_source"]['image'],
-            'min_playtime': content["_source"]['min_playtime'],
-            'max_playtime': content["_source"]['max_playtime'],
-            'min_players': content["_source"]['min_players'],
-            'max_players': content["_source"]['max_players'],
-            'min_age': content["_source"]['age']
-        })
-    
-    return_list = pick_filter_min_age(return_list, min_age)
-    return_list = pick_filter_min_playtime(return_list, min_playtime)
-    return_list = pick_filter_max_playtime(return_list, max_playtime)
-    return_list = pick_filter_min_players(return_list, min_players)
-    return_list = pick_filter_max_players(return_list, max_players)
-
-    if len(return_list) != 0:
-        response = [random.choice(return_list)]
-    else:
-        response = []
+    # filtering and sampling happen in one pass over the catalog,
+    # or in one search when a game is not in the catalog
+    public_ids = {item.bg_id: item.public_id for item in items}
+    response = pick_from_catalog(app.catalog, list(public_ids), n,
+        min_age, min_playtime, max_playtime, min_players, max_players)
+    if response == None:
+        response = pick_games(app.es_client, list(public_ids), n,
+            min_age, min_playtime, max_playtime, min_players, max_players)
+    for pick in response:
+        pick['public_id'] = public_ids.get(pick['bg_id'])
 
     return jsonify(response)
 
-@app.route('/send_message', methods =['POST'])
-def send_message():
-    # get json variables
-    data = request.json
+# refills the llm memory with the last human/ai pairs of an existing chat
+# only the pairs that fit in the memory window are loaded
+def restore_memory(memory, chat_id):
+    history_list = get_recent_messages(chat_id, memory.k * 2)
+    input_message = ''
+    output_message = ''
+    for c in history_list:
+        if len(input_message) == 0:
+            if c.is_human:
+                input_message = c.message
+        # an answer whose question fell outside the window is skipped
+        if len(output_message) == 0 and len(input_message) != 0:
+            if not c.is_human:
+                output_message = c.message
+        if len(input_message) != 0 and len(output_message) != 0:
+            memory.save_context({'input': input_message}, {'output': output_message})
+            input_message = ''
+            output_message = ''
+
+# everything one message of either chat route needs, see prepare_chat
+Chat = namedtuple('Chat', ['message', 'rulebook', 'user', 'qa', 'history', 'new_history', 'question_vector', 'cached_answer'])
+
+# looks up the rulebook, user and chat history of a message and sets up the chain
+# a first message gets a new unsaved chat history, the embedding of the question
+# and the cached answer of a near identical first question, if any
+# returns (chat, None) or (None, error response)
+def prepare_chat(data):
     message = data.get('message')
     user_id = data.get('user_id')
     chat_id = data.get('chat_id')
     game = data.get('game')
 
-    new_history = False
-
     # find existing rulebook
     rulebook = Rulebook.query\
         .filter_by(id = game)\
         .first()
 
     if not rulebook:
-        return jsonify({
+        return None, (jsonify({
                 'message' : 'game not found'
-            }), 404
+            }), 404)
+
+    # find existing user
+    user = User.query\
+        .filter_by(public_id = user_id)\
+        .first()
+
+    if not user:
+        return None, (jsonify({
+                'message' : 'user not found'
+            }), 404)
 
     # setup llm
     memory = ConversationBufferWindowMemory(
@@ -742,96 +877,160 @@ def send_message():
         k=3
     )
     # qdrant
-    qdrant = QdrantVectorStore.from_existing_collection(
-        embedding=app.embeddings,
-        collection_name=rulebook.qdrant,
-        url=app.qdrant_url,
-        api_key=os.environ["QDRANT_KEY"],
-    )
-    retriever=qdrant.as_retriever()
+    retriever = app.retrievers.get(rulebook.qdrant)
     qa = ConversationalRetrievalChain.from_llm(
         app.llm,
         retriever=retriever,
         memory=memory
     )
 
-    # find existing user
-    user = User.query\
-        .filter_by(public_id = user_id)\
-        .first()
     # try to find existing chat history
     history = ChatHistory.query\
         .filter_by(public_id = chat_id)\
         .filter_by(game = game)\
         .first()
 
-    if user:
-        # if chat history does not exist, create it
-        if not history:
-            history = ChatHistory(
-                public_id = str(uuid.uuid4()),
-                # name = datetime.now().strftime("%a, %d %b %Y"),
-                name = message,
-                game = rulebook.id
-            )
-            user.chats.append(history)
-            db.session.add(history)
-            db.session.commit()
-            new_history = True
-        elif history:
-            history_list = get_history(chat_id)['chats']
-            input_message = ''
-            output_message = ''
-            for c in history_list:
-                if len(input_message) == 0:
-                    if c['is_human']:
-                        input_message = c['message']
-                        # print(input_message)
-                if len(output_message) == 0:
-                    if not c['is_human']:
-                        output_message = c['message']
-                        # print(output_message)
-                if len(input_message) != 0 and len(output_message) != 0:
-                    memory.save_context({'input': input_message}, {'output': output_message})
-                    input_message = ''
-                    output_message = ''
-
-            # print(memory.load_memory_variables({}))
-        # save user message to database
-        new_user_chat = ChatMessage(
-            public_id = str(uuid.uuid4()),
-            is_human = True,
-            date = datetime.now(),
-            message = message
-        )
-        history.chats.append(new_user_chat)
-
-        # invoke llm
-        result = qa.invoke(message)
-        # save ai message to database
-        new_ai_chat = ChatMessage(
+    # a new chat history is only saved together with its first answer
+    new_history = False
+    if not history:
+        history = ChatHistory(
             public_id = str(uuid.uuid4()),
-            is_human = False,
-            date = datetime.now(),
-            message = result['answer']
+            name = message,
+            game = rulebook.id
         )
-        history.chats.append(new_ai_chat)
+        new_history = True
+    else:
+        restore_memory(memory, chat_id)
+
+    # first questions can be answered from past answers of the same rulebook
+    question_vector = None
+    cached_answer = None
+    if new_history:
+        question_vector = app.embeddings.embed_query(message)
+        cached_answer = app.answers.lookup(rulebook.qdrant, question_vector)
+
+    return Chat(message, rulebook, user, qa, history, new_history, question_vector, cached_answer), None
+
+# saves the question asked at user_date and its answer, a new chat history
+# with them, returns the /send_message response
+def save_chat(chat, user_date, answer):
+    if chat.new_history and chat.cached_answer == None:
+        app.answers.store(chat.rulebook.qdrant, chat.question_vector, answer)
+
+    if chat.new_history:
+        chat.user.chats.append(chat.history)
+        db.session.add(chat.history)
+    # save both messages to database
+    new_user_chat = ChatMessage(
+        public_id = str(uuid.uuid4()),
+        is_human = True,
+        date = user_date,
+        message = chat.message
+    )
+    new_ai_chat = ChatMessage(
+        public_id = str(uuid.uuid4()),
+        is_human = False,
+        date = datetime.now(),
+        message = answer
+    )
+    chat.history.chats.append(new_user_chat)
+    chat.history.chats.append(new_ai_chat)
+    db.session.add_all([new_user_chat, new_ai_chat])
+    db.session.commit()
 
-        # commit to database
-        db.session.add_all([new_user_chat, new_ai_chat])
-        db.session.commit()
+    return {
+        "date": new_ai_chat.date.strftime("%a, %d %b %Y %X"),
+        "is_human": False,
+        "message": answer,
+        "is_new": chat.new_history,
+        "history_id": chat.history.public_id
+    }
 
-        response = {
-            "date": new_ai_chat.date.strftime("%a, %d %b %Y %X"),
-            "is_human": False,
-            "message": result['answer'],
-            "is_new": new_history,
-            "history_id": history.public_id
-        }
-    return jsonify(response)
+@app.route('/send_message', methods =['POST'])
+def send_message():
+    chat, error = prepare_chat(request.json)
+    if error != None:
+        return error
 
+    user_date = datetime.now()
+    answer = chat.cached_answer
+    if answer == None:
+        # invoke llm
+        answer = chat.qa.invoke(chat.message)['answer']
+    return jsonify(save_chat(chat, user_date, answer))
+
+# same as /send_message but streams the answer as server-sent events:
+# start (history_id, is_new), one token event per llm token, then done with
+# the /send_message response once the messages are saved
+# nothing is saved when the client disconnects or the llm fails
+@app.route('/send_message_stream', methods =['POST'])
+def send_message_stream():
+    chat, error = prepare_chat(request.json)
+    if error != None:
+        return error
+
+    user_date = datetime.now()
+
+    def generate():
+        answer = []
+        if chat.cached_answer != None:
+            tokens = iter([chat.cached_answer])
+        else:
+            tokens = stream_answer(chat.qa, app.llm, chat.message)
+        try:
+            yield sse_event('start', {
+                "is_new": chat.new_history,
+                "history_id": chat.history.public_id
+            })
+            for token in tokens:
+                answer.append(token)
+                yield sse_event('token', {"token": token})
+        except GeneratorExit:
+            # client disconnected midway
+            db.session.rollback()
+            raise
+        except Exception:
+            db.session.rollback()
+            yield sse_event('error', {'message': 'could not answer the message'})
+            return
+        finally:
+            if hasattr(tokens, 'close'):
+                tokens.close()
+
+        yield sse_event('done', save_chat(chat, user_date, ''.join(answer)))
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # keeps nginx from buffering the events
+        'X-Accel-Buffering': 'no'
+    })
+
+# messages and chats per page of the history routes
+DEFAULT_HISTORY_LIMIT = 50
+MAX_HISTORY_LIMIT = 200
+
+# limit query parameter of the history routes, None when it is not a positive number
+def history_limit():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_HISTORY_LIMIT))
+    except ValueError:
+        return None
+    if limit < 1:
+        return None
+    return min(limit, MAX_HISTORY_LIMIT)
+
+# the latest limit messages of a chat, oldest first
+# next_cursor loads the messages before them, it is null on the first message
 @app.route('/get_history/<chat_id>', methods =['GET'])
+@read_only
 def get_history(chat_id="-1"):
+    limit = history_limit()
+    if limit == None:
+        return jsonify({'message' : 'limit must be a positive number'}), 400
+    try:
+        before = decode_message_cursor(request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'message' : 'invalid cursor'}), 400
 
     # try to find existing chat history
     history = ChatHistory.query\
@@ -840,9 +1039,7 @@ def get_history(chat_id="-1"):
     
     result = []
     if history:
-        chats = ChatMessage.query\
-            .filter_by(chat_id = chat_id)\
-            .all()
+        chats, more = get_message_page(chat_id, limit, before)
         for c in chats:
             result.append({
                 "date": c.date.strftime("%a, %d %b %Y %X"),
@@ -868,13 +1065,24 @@ def get_history(chat_id="-1"):
             "name": history.name,
             "public_id": history.public_id
         },
-        "chats": result
+        "chats": result,
+        "next_cursor": message_cursor(chats[0]) if more else None
     }
     
     return response
 
+# the latest limit chats of a user, newest first
+# the X-Next-Cursor header holds the cursor of the older chats when there are any
 @app.route('/get_all_history/<user_id>', methods =['GET'])
+@read_only
 def get_all_history(user_id="-1"):
+    limit = history_limit()
+    if limit == None:
+        return jsonify({'message' : 'limit must be a positive number'}), 400
+    try:
+        before_id = decode_history_cursor(request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'message' : 'invalid cursor'}), 400
 
     # try to find existing chat history
     user = User.query\
@@ -883,9 +1091,7 @@ def get_all_history(user_id="-1"):
     
     result = []
     if user:
-        history = ChatHistory.query\
-            .filter_by(user_id = user_id)\
-            .all()
+        history, more = get_history_page(user_id, limit, before_id)
         for h in history:
             result.append({
                 "name": h.name,
@@ -897,7 +1103,10 @@ def get_all_history(user_id="-1"):
                 'message' : 'user not found'
             }), 404
     
-    return result
+    response = jsonify(result)
+    if more:
+        response.headers['X-Next-Cursor'] = history_cursor(history[-1])
+    return response
 
 @app.route('/delete_history', methods =['POST'])
 def delete_history():
@@ -921,7 +1130,56 @@ def delete_history():
     db.session.commit()
     return make_response('delete history')
 
+# cache and pool counters
+@app.route('/stats', methods =['GET'])
+def get_stats():
+    return jsonify({
+        'embeddings': app.embeddings.stats(),
+        'retrievers': app.retrievers.stats(),
+        'answers': app.answers.stats(),
+        'principals': app.principals.stats(),
+        'search': app.search_cache.stats(),
+        'database': pool_stats(db.engines)
+    })
+
+# drops the cached /search responses after the bgg index is rebuilt,
+# es_indexer.py --notify calls it once the alias points at the new index
+@app.route('/invalidate_search', methods =['POST'])
+@token_required
+def invalidate_search(current_user):
+    if current_user == None or current_user.roles != 'ROLE_ADMIN':
+        return jsonify({'message' : 'admin only'}), 403
+
+    app.search_cache.invalidate()
+    # pick up the catalog, similar games and game vectors of the new index,
+    # the other workers see the new generation and reload on their next request
+    app.catalog_generation.bump()
+    refresh_catalog()
+    return make_response('invalidate search')
+
+# drops the cached answers and retriever of a re-ingested rulebook
+@app.route('/invalidate_rulebook', methods =['POST'])
+@token_required
+def invalidate_rulebook(current_user):
+    if current_user == None or current_user.roles != 'ROLE_ADMIN':
+        return jsonify({'message' : 'admin only'}), 403
+
+    data = request.json
+    rulebook = Rulebook.query\
+        .filter_by(id = data.get('game'))\
+        .first()
+
+    if not rulebook:
+        return jsonify({
+                'message' : 'game not found'
+            }), 404
+
+    app.answers.invalidate(rulebook.qdrant)
+    app.retrievers.evict(rulebook.qdrant)
+    return make_response('invalidate rulebook')
+
 @app.route('/get_rulebooks', methods =[ 'GET' ])
+@read_only
 def get_rulebooks():
     rulebooks = Rulebook.query.all()
     json_rulebooks = []
@@ -934,6 +1192,20 @@ def get_rulebooks():
         })
     return jsonify(json_rulebooks)
 
+# builds the retriever of every rulebook before the first message
+def warm_up_retrievers():
+    with app.app_context():
+        app.retrievers.warm_up([r.qdrant for r in Rulebook.query.all()])
+
+if os.environ.get('WARM_UP_RETRIEVERS'):
+    warm_up_retrievers()
+
+# flask --app app migrate, creates or upgrades the schema
+@app.cli.command('migrate')
+def migrate_command():
+    applied = migrate(db.engine)
+    print('applied', applied if len(applied) != 0 else 'nothing, schema is up to date')
+
 if __name__ == "__main__":
     # setting debug to True enables hot reload
     # and also provides a debugger shell
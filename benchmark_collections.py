@@ -0,0 +1,127 @@
+# compares the old per-collection sidebar path of get_collections_by_user_id
+# with the single summary query + one thumbnail lookup
+# runs against an in-memory sqlite database and a fake elasticsearch client
+# that sleeps ES_LATENCY seconds per call to stand in for the network
+#
+# usage: python benchmark_collections.py
+import time
+import uuid
+
+from flask import Flask
+from sqlalchemy import event
+
+from game_lookup import get_games_by_ids
+from models import db, User, Collection, CollectionItem
+from queries import get_collection_summaries
+
+ES_LATENCY = 0.002
+ITEMS_PER_COLLECTION = 10
+COLLECTION_COUNTS = [1, 10, 40, 100]
+
+class countingEsClient:
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, index, query, size=10, source=None):
+        self.calls += 1
+        time.sleep(ES_LATENCY)
+        if 'terms' in query['constant_score']['filter']:
+            ids = query['constant_score']['filter']['terms']['id']
+        else:
+            ids = [query['constant_score']['filter']['term']['id']]
+        return {'hits': {'hits': [
+            {'_id': str(bg_id), '_source': {'id': bg_id, 'image': str(bg_id) + '.jpg'}} for bg_id in ids
+        ]}}
+
+# the route before the summary query, kept here for comparison
+def legacy_summaries(es_client, user_id):
+    collections = Collection.query\
+        .filter_by(user_id = user_id)\
+        .all()
+    output = []
+    for collection in collections:
+        game_count = 0
+        thumbnail = []
+        items = CollectionItem.query\
+            .filter_by(collection_id = collection.public_id)\
+            .all()
+        for item in items:
+            if game_count <= 2:
+                content = es_client.search(index='bgg', query={
+                        "constant_score" : {
+                                "filter" : {
+                                    "term" : {
+                                        "id" : item.bg_id
+                                    }
+                                }
+                            }
+                    })['hits']['hits']
+                if len(content) != 0:
+                    thumbnail.append(content[0]["_source"]['image'])
+            game_count = game_count + 1
+        output.append({
+            'name': collection.name,
+            'public_id': collection.public_id,
+            'game_count': game_count,
+            'thumbnail': thumbnail
+        })
+    return output
+
+def summary_path(es_client, user_id):
+    summaries = get_collection_summaries(user_id)
+    games = get_games_by_ids(es_client, [bg_id for summary in summaries for bg_id in summary['bg_ids']], source=['image'])
+    return [{
+        'name': summary['name'],
+        'public_id': summary['public_id'],
+        'game_count': summary['game_count'],
+        'thumbnail': [games[bg_id]['_source']['image'] for bg_id in summary['bg_ids'] if bg_id in games]
+    } for summary in summaries]
+
+def seed(collection_count):
+    user = User(
+        public_id = str(uuid.uuid4()),
+        username = 'bench',
+        email = str(uuid.uuid4()) + '@bench',
+        password = 'bench',
+        roles = 'ROLE_USER'
+    )
+    db.session.add(user)
+    for c in range(collection_count):
+        collection = Collection(name = 'collection ' + str(c), public_id = str(uuid.uuid4()))
+        user.collections.append(collection)
+        for i in range(ITEMS_PER_COLLECTION):
+            collection.boardgames.append(CollectionItem(bg_id = 1000 + i * 7 + c, public_id = str(uuid.uuid4())))
+    db.session.commit()
+    return user.public_id
+
+def measure(path, user_id):
+    es_client = countingEsClient()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    start = time.perf_counter()
+    output = path(es_client, user_id)
+    elapsed = time.perf_counter() - start
+    event.remove(db.engine, 'before_cursor_execute', listener)
+    return output, len(statements), es_client.calls, elapsed
+
+def main():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        print('collections | legacy sql/es/ms | summary sql/es/ms')
+        for collection_count in COLLECTION_COUNTS:
+            user_id = seed(collection_count)
+            legacy, legacy_sql, legacy_es, legacy_time = measure(legacy_summaries, user_id)
+            summary, summary_sql, summary_es, summary_time = measure(summary_path, user_id)
+            assert legacy == summary
+            print('%11d | %4d/%4d/%7.1f | %4d/%4d/%7.1f' % (
+                collection_count,
+                legacy_sql, legacy_es, legacy_time * 1000,
+                summary_sql, summary_es, summary_time * 1000
+            ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# compares the chained pick_filter_* list filters with pick_filter_mask
+# on random games shaped like the pick list
+#
+# usage: python benchmark_pick_filter.py
+import random
+import timeit
+
+import numpy as np
+
+from pick_filter import pick_filter_mask, pick_filter_min_age, pick_filter_min_playtime, pick_filter_max_playtime
+from pick_filter import pick_filter_min_players, pick_filter_max_players
+
+SIZES = [10000, 100000]
+CASE = (18, 30, 180, 2, 4)
+REPEAT = 10
+FIELDS = ['min_age', 'min_playtime', 'max_playtime', 'min_players', 'max_players']
+
+def make_pick_list(size, seed):
+    generator = random.Random(seed)
+    return [
+        {
+            'min_age': generator.randint(0, 21),
+            'min_playtime': generator.choice([15, 30, 45, 60, 90, 120]),
+            'max_playtime': generator.choice([30, 60, 90, 120, 180, 240]),
+            'min_players': generator.randint(1, 4),
+            'max_players': generator.randint(1, 10)
+        }
+        for i in range(size)
+    ]
+
+# the pick path before pick_filter_mask, kept here for comparison
+def list_path(return_list, min_age, min_playtime, max_playtime, min_players, max_players):
+    return_list = pick_filter_min_age(return_list, min_age)
+    return_list = pick_filter_min_playtime(return_list, min_playtime)
+    return_list = pick_filter_max_playtime(return_list, max_playtime)
+    return_list = pick_filter_min_players(return_list, min_players)
+    return_list = pick_filter_max_players(return_list, max_players)
+    return return_list
+
+def main():
+    print('    items | lists ms | mask ms')
+    for size in SIZES:
+        pick_list = make_pick_list(size, size)
+        columns = {field: np.array([item[field] for item in pick_list]) for field in FIELDS}
+        assert int(pick_filter_mask(columns, *CASE).sum()) == len(list_path(pick_list, *CASE))
+        list_time = timeit.timeit(lambda: list_path(pick_list, *CASE), number=REPEAT) / REPEAT
+        mask_time = timeit.timeit(lambda: pick_filter_mask(columns, *CASE), number=REPEAT) / REPEAT
+        print('%9d | %8.2f | %7.2f' % (size, list_time * 1000, mask_time * 1000))
+
+if __name__ == '__main__':
+    main()
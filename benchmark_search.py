@@ -0,0 +1,51 @@
+# compares the old pandas DataFrame path of /search with project_hits
+# on synthetic hits shaped like the bgg index
+#
+# usage: python benchmark_search.py
+import timeit
+
+import pandas as pd
+
+from search_projection import project_hits
+
+COLUMNS = ['id', 'bayes_average', 'year_published', 'min_players', 'max_players', 'playing_time',
+           'min_playtime', 'max_playtime', 'age', 'name', 'description', 'thumbnail',
+           'image', 'boardgame_publisher', 'boardgame_category', 'videogame_bg',
+           'boardgame_designer', 'boardgame_artist', 'boardgame_mechanic', 'boardgame_subdomain']
+LIST_FIELDS = ['id', 'name', 'image', 'thumbnail']
+PAGE_SIZES = [32, 100, 500]
+REPEAT = 200
+
+def make_hits(size, columns):
+    hits = []
+    for i in range(size):
+        source = {}
+        for column in columns:
+            if column == 'description':
+                source[column] = 'long description text ' * 100
+            elif column in ('id', 'year_published', 'min_players', 'max_players', 'age'):
+                source[column] = i
+            else:
+                source[column] = column + ' ' + str(i)
+        hits.append({'_id': str(i), '_score': 1.0 / (i + 1), '_source': source})
+    return hits
+
+# the route before project_hits, kept here for comparison
+def pandas_path(hits):
+    results_df = pd.DataFrame([[hit['_source'][key] for key in hit['_source']] for hit in hits], columns=COLUMNS)
+    results_df['_score'] = [hit['_score'] for hit in hits]
+    return results_df.to_dict('records')
+
+def main():
+    print('page size | pandas us | projection us | list fields us')
+    for size in PAGE_SIZES:
+        hits = make_hits(size, COLUMNS)
+        list_hits = make_hits(size, LIST_FIELDS)
+        assert pandas_path(hits) == project_hits(hits, COLUMNS)
+        pandas_time = timeit.timeit(lambda: pandas_path(hits), number=REPEAT) / REPEAT
+        projection_time = timeit.timeit(lambda: project_hits(hits, COLUMNS), number=REPEAT) / REPEAT
+        list_time = timeit.timeit(lambda: project_hits(list_hits, LIST_FIELDS), number=REPEAT) / REPEAT
+        print('%9d | %9.1f | %13.1f | %14.1f' % (size, pandas_time * 1e6, projection_time * 1e6, list_time * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+# fetches the game metadata of boardgames_ranks.csv from the BGG XML API
+# ids are requested batch_size at a time (the API takes comma separated ids) by
+# a bounded pool of workers sharing one rate limiter, every finished batch is
+# written to a sqlite checkpoint, so a crashed run resumes where it stopped and
+# later runs only request new games, games whose name or year changed in the
+# ranks file, games the API left out fewer than --max-misses times and, with
+# --max-age-days, games fetched too long ago
+#
+# usage: python bgg_fetcher.py [--ranks boardgames_ranks.csv] [--output bgg_games_info.csv]
+#        [--batch-size 20] [--workers 4] [--rate 0.5] [--max-age-days 30] [--max-misses 3]
+import argparse
+import csv
+import json
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+BGG_API_URL = 'https://api.geekdo.com/xmlapi/boardgame/'
+# xml tags kept for every game and their column in bgg_games_info.csv
+TO_KEEP = ['yearpublished', 'minplayers', 'maxplayers', 'playingtime',
+           'minplaytime', 'maxplaytime', 'age', 'name', 'description', 'thumbnail',
+           'image', 'boardgamepublisher',
+           'boardgamecategory',
+           'videogamebg', 'boardgamedesigner', 'boardgameartist',
+           'boardgamemechanic',
+           'boardgamesubdomain']
+COLUMNS = ['id', 'bayes_average', 'year_published', 'min_players', 'max_players', 'playing_time',
+           'min_playtime', 'max_playtime', 'age', 'name', 'description', 'thumbnail',
+           'image', 'boardgame_publisher',
+           'boardgame_category',
+           'videogame_bg', 'boardgame_designer', 'boardgame_artist',
+           'boardgame_mechanic',
+           'boardgame_subdomain']
+# ranks file columns that mean the metadata of a game changed, the rank and
+# averages change daily and are taken from the ranks file on export instead
+FINGERPRINT_FIELDS = ['name', 'yearpublished']
+# responses worth retrying, 202 means the request was queued
+RETRY_STATUS = {202, 429, 500, 502, 503, 504}
+# runs a game may be left out of the answers before it counts as deleted
+MAX_MISSES = 3
+
+# at most rate requests per second over all threads
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# {bg_id: {column: value}} of one API response, same fields as fetch.ipynb
+def parse_games(content):
+    games = {}
+    for game in ET.fromstring(content).findall('./boardgame'):
+        values = {}
+        for tag, column in zip(TO_KEEP, COLUMNS[2:]):
+            if tag == 'name':
+                values[column] = next((name.text for name in game.findall('name') if name.attrib.get('primary') == 'true'), None)
+            else:
+                element = game.find(tag)
+                values[column] = element.text if element != None else ''
+        games[int(game.attrib.get('objectid'))] = values
+    return games
+
+def fingerprint(row):
+    return json.dumps([row.get(field) for field in FINGERPRINT_FIELDS])
+
+# fetched games by id with the fingerprint of the ranks row they were fetched for
+# misses counts the answers in a row that left out a game without stored data
+class FetchCheckpoint:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS game (id INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL, fetched_at REAL NOT NULL, data TEXT, misses INTEGER NOT NULL DEFAULT 0)')
+        # checkpoints written before misses existed, their empty games are retried
+        if 'misses' not in [column[1] for column in self.connection.execute('PRAGMA table_info(game)')]:
+            self.connection.execute('ALTER TABLE game ADD COLUMN misses INTEGER NOT NULL DEFAULT 0')
+            self.connection.execute('UPDATE game SET misses = 1 WHERE data IS NULL')
+        self.connection.commit()
+        self.lock = threading.Lock()
+
+    # {bg_id: (fingerprint, fetched_at, misses)}
+    def fetched(self):
+        with self.lock:
+            return {bg_id: (value, fetched_at, misses) for bg_id, value, fetched_at, misses in self.connection.execute('SELECT id, fingerprint, fetched_at, misses FROM game')}
+
+    # [(bg_id, fingerprint, data)] of one batch in one transaction, data is None
+    # for ids the API did not return, e.g. deleted games or a partial answer,
+    # which keeps the data of an earlier run, or else counts a miss
+    def save(self, games, now=None):
+        if now == None:
+            now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                'INSERT INTO game (id, fingerprint, fetched_at, data, misses) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET fingerprint = excluded.fingerprint, fetched_at = excluded.fetched_at, '
+                'data = COALESCE(excluded.data, game.data), '
+                'misses = CASE WHEN excluded.data IS NOT NULL OR game.data IS NOT NULL THEN 0 '
+                'WHEN game.fingerprint != excluded.fingerprint THEN 1 ELSE game.misses + 1 END',
+                [(bg_id, value, now, json.dumps(data) if data != None else None, 1 if data == None else 0) for bg_id, value, data in games]
+            )
+            self.connection.commit()
+
+    # {bg_id: data} of every game the API returned
+    def games(self):
+        with self.lock:
+            return {bg_id: json.loads(data) for bg_id, data in self.connection.execute('SELECT id, data FROM game WHERE data IS NOT NULL')}
+
+    def close(self):
+        self.connection.close()
+
+# [(bg_id, fingerprint)] of the ranks rows that are new, changed, older than
+# max_age seconds or left out of fewer than max_misses answers so far
+def ids_to_fetch(ranks, fetched, max_age=None, now=None, max_misses=MAX_MISSES):
+    if now == None:
+        now = time.time()
+    pending = []
+    for row in ranks:
+        bg_id = int(row['id'])
+        value = fingerprint(row)
+        previous = fetched.get(bg_id)
+        if previous == None or previous[0] != value or (max_age != None and now - previous[1] > max_age) \
+                or 0 < previous[2] < max_misses:
+            pending.append((bg_id, value))
+    return pending
+
+class BggFetcher:
+    def __init__(self, checkpoint, url=BGG_API_URL, batch_size=20, workers=4, rate=0.5, retries=5, backoff=2.0, timeout=30, max_misses=MAX_MISSES):
+        self.checkpoint = checkpoint
+        self.max_misses = max_misses
+        self.url = url
+        self.batch_size = batch_size
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.local = threading.local()
+
+    # one requests session per worker thread, they are not thread safe
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    # {bg_id: data} of one batch of ids, connection errors, timeouts and
+    # RETRY_STATUS responses are retried with exponential backoff
+    def fetch_batch(self, bg_ids):
+        url = self.url + ','.join(str(bg_id) for bg_id in bg_ids)
+        attempt = 0
+        while True:
+            self.limiter.wait()
+            try:
+                response = self.session().get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return parse_games(response.content)
+                if attempt == self.retries:
+                    raise RuntimeError('BGG API still answers ' + str(response.status_code) + ' for ' + url)
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    # fetches every pending game of ranks, at most workers batches in flight
+    # batches that still fail after the retries are left for the next run
+    def run(self, ranks, max_age=None):
+        pending = ids_to_fetch(ranks, self.checkpoint.fetched(), max_age, max_misses=self.max_misses)
+        batches = iter([pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)])
+        stats = {'requested': len(pending), 'fetched': 0, 'missing': 0, 'failed_batches': 0}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {}
+            def submit():
+                batch = next(batches, None)
+                if batch != None:
+                    futures[pool.submit(self.fetch_batch, [bg_id for bg_id, value in batch])] = batch
+            for _ in range(self.workers):
+                submit()
+            while len(futures) != 0:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = futures.pop(future)
+                    try:
+                        games = future.result()
+                    except (requests.RequestException, RuntimeError, ET.ParseError):
+                        stats['failed_batches'] += 1
+                    else:
+                        self.checkpoint.save([(bg_id, value, games.get(bg_id)) for bg_id, value in batch])
+                        stats['fetched'] += sum(1 for bg_id, value in batch if bg_id in games)
+                        stats['missing'] += sum(1 for bg_id, value in batch if bg_id not in games)
+                    submit()
+        return stats
+
+# writes the fetched games in ranks order with the bayes average of the ranks file
+def export_csv(checkpoint, ranks, path):
+    games = checkpoint.games()
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for row in ranks:
+            game = games.get(int(row['id']))
+            if game == None:
+                continue
+            writer.writerow([row['id'], row.get('bayesaverage')] + [game.get(column) for column in COLUMNS[2:]])
+            written += 1
+    return written
+
+def read_ranks(path, limit=None):
+    with open(path, newline='', encoding='utf-8') as f:
+        ranks = list(csv.DictReader(f))
+    return ranks[:limit] if limit != None else ranks
+
+def main():
+    parser = argparse.ArgumentParser(description='fetch the metadata of every ranked game from the BGG XML API')
+    parser.add_argument('--ranks', default='boardgames_ranks.csv')
+    parser.add_argument('--checkpoint', default='bgg_fetch.sqlite3')
+    parser.add_argument('--output', default='bgg_games_info.csv')
+    parser.add_argument('--url', default=BGG_API_URL)
+    parser.add_argument('--batch-size', type=int, default=20, help='ids per request')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent requests')
+    parser.add_argument('--rate', type=float, default=0.5, help='requests per second over all workers')
+    parser.add_argument('--max-age-days', type=float, default=None, help='refetch games fetched longer ago')
+    parser.add_argument('--max-misses', type=int, default=MAX_MISSES, help='answers that may leave a game out before it counts as deleted')
+    parser.add_argument('--limit', type=int, default=None, help='only the first ranks rows')
+    args = parser.parse_args()
+
+    ranks = read_ranks(args.ranks, args.limit)
+    checkpoint = FetchCheckpoint(args.checkpoint)
+    fetcher = BggFetcher(checkpoint, url=args.url, batch_size=args.batch_size, workers=args.workers, rate=args.rate, max_misses=args.max_misses)
+    max_age = args.max_age_days * 86400 if args.max_age_days != None else None
+    print(fetcher.run(ranks, max_age))
+    print('wrote', export_csv(checkpoint, ranks, args.output), 'games to', args.output)
+    checkpoint.close()
+
+if __name__ == '__main__':
+    main()
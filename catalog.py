@@ -0,0 +1,58 @@
+import math
+
+# index the catalog hits claim to come from, es_indexer.py writes the game id as _id
+CATALOG_INDEX = 'bgg'
+
+# read-only boardgame catalog built from the cleaned parquet dataframe
+# every column is kept as one numpy array and ids map to their row position,
+# so id lookups are a dict hit plus one array read per column
+class GameCatalog:
+    def __init__(self, df):
+        self.columns = list(df.columns)
+        self.data = {column: df[column].to_numpy() for column in self.columns}
+        self.positions = {}
+        for position, bg_id in enumerate(self.data['id']):
+            try:
+                self.positions[int(bg_id)] = position
+            except (TypeError, ValueError):
+                continue
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, bg_id):
+        return self.position(bg_id) != None
+
+    def position(self, bg_id):
+        try:
+            return self.positions.get(int(bg_id))
+        except (TypeError, ValueError):
+            return None
+
+    # one game as a new dict shaped like the elasticsearch _source
+    # fields limits the returned columns, returns None for unknown ids
+    def get(self, bg_id, fields=None):
+        position = self.position(bg_id)
+        if position == None:
+            return None
+        if fields == None:
+            fields = self.columns
+        return {field: to_python(self.data[field][position]) for field in fields if field in self.data}
+
+    def get_many(self, bg_ids, fields=None):
+        return [self.get(bg_id, fields) for bg_id in bg_ids]
+
+    # one game shaped like an elasticsearch hit, None for unknown ids
+    def hit(self, bg_id, fields=None):
+        game = self.get(bg_id, fields)
+        if game == None:
+            return None
+        return {'_index': CATALOG_INDEX, '_id': str(int(bg_id)), '_source': game}
+
+# numpy scalars and NaN are not json serializable, elasticsearch returns null for NaN
+def to_python(value):
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
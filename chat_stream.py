@@ -0,0 +1,29 @@
+import json
+
+from langchain_core.messages import get_buffer_string
+from langchain_core.prompts import format_document
+
+# answers like qa.invoke but yields the llm tokens as they arrive
+# runs the same steps as ConversationalRetrievalChain with its own prompts:
+# condense the question when there is history, retrieve, then stream the answer
+def stream_answer(qa, llm, question):
+    chat_history = qa.memory.load_memory_variables({})[qa.memory.memory_key]
+    if chat_history:
+        question = qa.question_generator.invoke({
+            'question': question,
+            'chat_history': get_buffer_string(chat_history)
+        })[qa.question_generator.output_key]
+
+    docs = qa.retriever.invoke(question)
+    combine = qa.combine_docs_chain
+    context = combine.document_separator.join(format_document(doc, combine.document_prompt) for doc in docs)
+    prompt = combine.llm_chain.prompt.format(**{
+        combine.document_variable_name: context,
+        'question': question
+    })
+    for token in llm.stream(prompt):
+        yield token
+
+# one server-sent event
+def sse_event(event, data):
+    return 'event: ' + event + '\ndata: ' + json.dumps(data) + '\n\n'
@@ -0,0 +1,17 @@
+import base64
+import json
+
+# opaque page tokens, compact json in urlsafe base64 so they can go in a query string
+def encode_token(value):
+    data = json.dumps(value, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+# value of a token, None for an empty token (first page)
+# raises ValueError for tokens that were not made by encode_token
+def decode_token(token):
+    if token == None or len(token) == 0:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('invalid cursor')
@@ -0,0 +1,99 @@
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+# bind key of the read replica in SQLALCHEMY_BINDS, it holds the same tables
+# as the default bind
+REPLICA_BIND = 'replica'
+
+# session that sends the queries of read_only views to the replica bind
+# flushes always go to the default bind, so a read-only view that writes by
+# mistake still writes to the primary
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind == None and not self._flushing and has_app_context() and g.get('read_replica', False):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine != None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+# marks a view as read-only, its queries run on the replica when one is configured
+# replicas lag behind the primary, only use it for views that tolerate that
+def read_only(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.read_replica = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.read_replica = False
+    return decorated
+
+# engine options from the environment, prefix DB_ for SQLALCHEMY_ENGINE_OPTIONS
+# and e.g. DB_REPLICA_ for the replica bind, so reads can be sized separately
+def engine_options(environ, prefix='DB_'):
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(environ.get(prefix + 'POOL_SIZE', 5)),
+        'max_overflow': int(environ.get(prefix + 'MAX_OVERFLOW', 10)),
+        'pool_timeout': float(environ.get(prefix + 'POOL_TIMEOUT', 30)),
+        'pool_recycle': int(environ.get(prefix + 'POOL_RECYCLE', 3600)),
+        'pool_pre_ping': environ.get(prefix + 'POOL_PRE_PING', '1') != '0'
+    }
+
+# QueuePool that counts checkouts and how long they waited for a connection
+# recreate() after a disconnect builds the same class, its counters restart
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.checked_out_max = 0
+
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            with self.metrics_lock:
+                self.timeouts += 1
+            raise
+        wait = time.monotonic() - start
+        with self.metrics_lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.checked_out_max = max(self.checked_out_max, self.checkedout())
+        return connection
+
+    def stats(self):
+        capacity = self.size() + max(self._max_overflow, 0)
+        with self.metrics_lock:
+            return {
+                'size': self.size(),
+                'max_overflow': self._max_overflow,
+                'checked_out': self.checkedout(),
+                'checked_out_max': self.checked_out_max,
+                'utilisation': self.checkedout() / capacity if capacity != 0 else 0.0,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_total': self.wait_total,
+                'wait_max': self.wait_max,
+                'wait_avg': self.wait_total / self.checkouts if self.checkouts != 0 else 0.0
+            }
+
+# pool metrics of every bind, the default bind is reported as default
+def pool_stats(engines):
+    stats = {}
+    for key, engine in engines.items():
+        if isinstance(engine.pool, TimedQueuePool):
+            stats[key or 'default'] = engine.pool.stats()
+    return stats
@@ -0,0 +1,98 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+# same question with different spacing or case hits the same entry
+def normalize_text(text):
+    return ' '.join(text.split()).lower()
+
+def cache_key(model, text):
+    return model + ':' + hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+# embeddings wrapper with an in-memory LRU in front of a local sqlite store
+# keys are the model name and a hash of the normalized text, so changing the
+# model never returns vectors of the old one
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings, model, path=None, max_size=10000):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_size = max_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.connection = None
+        if path != None:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS embedding (key TEXT PRIMARY KEY, vector BLOB NOT NULL)')
+            self.connection.commit()
+
+    def embed_query(self, text):
+        key = cache_key(self.model, text)
+        vector = self.lookup(key)
+        if vector == None:
+            vector = list(self.embeddings.embed_query(text))
+            self.store(key, vector)
+        return vector
+
+    # only the texts that are not cached are sent, in one call
+    def embed_documents(self, texts):
+        keys = [cache_key(self.model, text) for text in texts]
+        vectors = [self.lookup(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector == None]
+        if len(missing) != 0:
+            new_vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = list(vector)
+                self.store(keys[i], vectors[i])
+        return vectors
+
+    def lookup(self, key):
+        with self.lock:
+            vector = self.memory.get(key)
+            if vector != None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return vector
+            if self.connection != None:
+                row = self.connection.execute('SELECT vector FROM embedding WHERE key = ?', (key,)).fetchone()
+                if row != None:
+                    vector = array('d', row[0]).tolist()
+                    self.remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def store(self, key, vector):
+        with self.lock:
+            self.remember(key, vector)
+            if self.connection != None:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO embedding (key, vector) VALUES (?, ?)',
+                    (key, array('d', vector).tobytes())
+                )
+                self.connection.commit()
+
+    def remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'model': self.model,
+                'size': len(self.memory),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups != 0 else 0.0
+            }
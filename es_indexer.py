@@ -0,0 +1,151 @@
+# (re)builds the bgg search index without downtime
+# the parquet file is streamed in record batches into parallel bulk requests
+# against a new versioned index, e.g. bgg-20240101120000, which then replaces
+# the old one behind the bgg alias in one atomic aliases call, so app.py keeps
+# searching bgg the whole time
+#
+# usage: python es_indexer.py [--parquet ...] [--chunk-size 500] [--workers 4]
+#        [--batch-rows 5000] [--keep 1] [--similar] [--notify http://localhost:5000 --token ...]
+import argparse
+import math
+import os
+from datetime import datetime, timezone
+
+from elasticsearch import helpers
+
+INDEX_ALIAS = 'bgg'
+
+# record batches of the parquet file, only one batch is held in memory at a time
+def read_record_batches(path, batch_rows):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows):
+        yield batch.to_pylist()
+
+# NaN is not valid json, df.to_json wrote null for it
+def to_document(record):
+    return {
+        field: None if isinstance(value, float) and math.isnan(value) else value
+        for field, value in record.items()
+    }
+
+# bulk actions for every record of batches, the game id is the document _id
+# so a retried chunk overwrites instead of duplicating games
+def build_actions(index, batches):
+    for records in batches:
+        for record in records:
+            document = to_document(record)
+            yield {'_index': index, '_id': str(document['id']), '_source': document}
+
+def versioned_index_name(alias, now=None):
+    if now == None:
+        now = datetime.now(timezone.utc)
+    return alias + '-' + now.strftime('%Y%m%d%H%M%S')
+
+# indexes every game into index with workers threads sending chunk_size documents
+# per bulk request, replicas and refreshes are turned off while loading
+# returns (indexed, failed), the index is deleted again when loading raises
+def load_index(es_client, index, batches, chunk_size=500, workers=4, bulk=helpers.parallel_bulk):
+    es_client.indices.create(index=index, settings={'number_of_replicas': 0, 'refresh_interval': '-1'})
+    indexed = 0
+    failed = 0
+    try:
+        for ok, item in bulk(es_client, build_actions(index, batches), thread_count=workers, chunk_size=chunk_size, raise_on_error=False):
+            if ok:
+                indexed += 1
+            else:
+                failed += 1
+        # back to the defaults of the cluster
+        es_client.indices.put_settings(index=index, settings={'number_of_replicas': None, 'refresh_interval': None})
+        es_client.indices.refresh(index=index)
+    except Exception:
+        es_client.indices.delete(index=index)
+        raise
+    return indexed, failed
+
+# points alias at index in one atomic call
+# alias may still be the plain index the notebook created, it is removed in the same call
+# returns the indices alias pointed at before
+def swap_alias(es_client, alias, index):
+    actions = []
+    previous = []
+    if es_client.indices.exists_alias(name=alias):
+        previous = list(es_client.indices.get_alias(name=alias).keys())
+        actions += [{'remove': {'index': old, 'alias': alias}} for old in previous]
+    elif es_client.indices.exists(index=alias):
+        actions.append({'remove_index': {'index': alias}})
+    actions.append({'add': {'index': index, 'alias': alias}})
+    es_client.indices.update_aliases(actions=actions)
+    return previous
+
+# deletes the versioned indices of alias that are not in use, except the keep newest
+# so a bad rebuild can be rolled back by pointing the alias at the previous one
+def delete_old_indices(es_client, alias, current, keep=1):
+    indices = sorted(
+        (name for name in es_client.indices.get(index=alias + '-*').keys() if name != current),
+        reverse=True
+    )
+    deleted = indices[keep:]
+    for name in deleted:
+        es_client.indices.delete(index=name)
+    return deleted
+
+# builds a new index from the parquet file and swaps it in, the old index
+# stays live when any document failed
+def run_indexer(es_client, batches, alias=INDEX_ALIAS, chunk_size=500, workers=4, keep=1, bulk=helpers.parallel_bulk):
+    index = versioned_index_name(alias)
+    indexed, failed = load_index(es_client, index, batches, chunk_size, workers, bulk)
+    if failed != 0 or indexed == 0:
+        es_client.indices.delete(index=index)
+        raise RuntimeError(str(failed) + ' of ' + str(indexed + failed) + ' documents failed, ' + alias + ' was not changed')
+    previous = swap_alias(es_client, alias, index)
+    deleted = delete_old_indices(es_client, alias, index, keep)
+    return {'index': index, 'indexed': indexed, 'previous': previous, 'deleted': deleted}
+
+def main():
+    import requests
+    from dotenv import load_dotenv
+    from elasticsearch import Elasticsearch
+
+    parser = argparse.ArgumentParser(description='rebuild the bgg index behind its alias')
+    parser.add_argument('--parquet', default='bgg_games_info_cleaned.parquet.gzip')
+    parser.add_argument('--alias', default=INDEX_ALIAS)
+    parser.add_argument('--chunk-size', type=int, default=500, help='documents per bulk request')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent bulk requests')
+    parser.add_argument('--batch-rows', type=int, default=5000, help='parquet rows read at a time')
+    parser.add_argument('--keep', type=int, default=1, help='previous indices kept for a rollback')
+    parser.add_argument('--similar', action='store_true', help='rebuild the similar games index afterwards')
+    parser.add_argument('--notify', default=None, help='app url, its /invalidate_search is called afterwards')
+    parser.add_argument('--token', default=None, help='admin token for --notify')
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    es_client = Elasticsearch("https://localhost:9200", basic_auth=("elastic", os.environ.get('ELASTIC_KEY')), ca_certs="~/http_ca.crt")
+    result = run_indexer(
+        es_client,
+        read_record_batches(args.parquet, args.batch_rows),
+        alias=args.alias,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        keep=args.keep
+    )
+    print('indexed', result['indexed'], 'games into', result['index'], 'previous', result['previous'], 'deleted', result['deleted'])
+
+    if args.similar:
+        import pandas as pd
+
+        from catalog import GameCatalog
+        from similar_games import SIMILAR_GAMES_PATH, build_similar_games
+
+        catalog = GameCatalog(pd.read_parquet(args.parquet))
+        build_similar_games(es_client, catalog).save(os.environ.get('SIMILAR_GAMES_PATH', SIMILAR_GAMES_PATH))
+        print('rebuilt the similar games')
+
+    if args.notify != None:
+        response = requests.post(args.notify.rstrip('/') + '/invalidate_search', headers={'x-access-token': args.token})
+        response.raise_for_status()
+        print('invalidated', args.notify)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# facet counts for the search filter sidebar
+# build_facets runs once over the dataframe at startup, build_facet_aggs and
+# read_facet_aggs give the same shape for the hits of a single /search query
+
+# number of values returned for the designer/publisher/subdomain facets
+FACET_SIZE = 20
+# text fields and their keyword sub field used by the aggregations
+TERM_FACETS = {
+    'boardgame_subdomain': 'boardgame_subdomain.keyword',
+    'boardgame_designer': 'boardgame_designer.keyword',
+    'boardgame_publisher': 'boardgame_publisher.keyword',
+}
+# (key, from, to) buckets for the player counts, to is exclusive
+PLAYER_RANGES = [
+    ('1', 1, 2),
+    ('2', 2, 3),
+    ('3-4', 3, 5),
+    ('5-6', 5, 7),
+    ('7+', 7, None),
+]
+RANGE_FACETS = ['min_players', 'max_players']
+
+def build_facets(df):
+    facets = {
+        # same list /search used to build with unique() on every request
+        'categories': df['boardgame_subdomain'].unique().tolist(),
+        'counts': {}
+    }
+    for field in TERM_FACETS:
+        counts = df[field].value_counts().head(FACET_SIZE)
+        facets['counts'][field] = [{'value': value, 'count': int(count)} for value, count in counts.items()]
+    for field in RANGE_FACETS:
+        column = df[field]
+        buckets = []
+        for key, start, end in PLAYER_RANGES:
+            mask = column >= start
+            if end != None:
+                mask = mask & (column < end)
+            buckets.append({'value': key, 'count': int(mask.sum())})
+        facets['counts'][field] = buckets
+    return facets
+
+def build_facet_aggs():
+    aggs = {}
+    for field, keyword in TERM_FACETS.items():
+        aggs[field] = {"terms": {"field": keyword, "size": FACET_SIZE}}
+    for field in RANGE_FACETS:
+        ranges = []
+        for key, start, end in PLAYER_RANGES:
+            bucket = {"key": key, "from": start}
+            if end != None:
+                bucket["to"] = end
+            ranges.append(bucket)
+        aggs[field] = {"range": {"field": field, "ranges": ranges}}
+    return aggs
+
+def read_facet_aggs(aggregations):
+    counts = {}
+    for field in list(TERM_FACETS) + RANGE_FACETS:
+        buckets = aggregations.get(field, {}).get('buckets', [])
+        counts[field] = [{'value': bucket['key'], 'count': bucket['doc_count']} for bucket in buckets]
+    return counts
@@ -0,0 +1,98 @@
+# largest page elasticsearch returns by default (index.max_result_window)
+MAX_LOOKUP_SIZE = 10000
+# fields used by the more_like_this recommendations
+MLT_FIELDS = ["name", "description", "boardgame_subdomain"]
+
+# fetch every boardgame in bg_ids with one terms search per MAX_LOOKUP_SIZE ids
+# returns {bg_id: hit}, ids that are not in the index are left out
+# ids found in the in-memory catalog are served from it, with the game id as
+# _id like es_indexer.py indexes them, and only the remaining ids are searched
+def get_games_by_ids(es_client, bg_ids, source=None, catalog=None):
+    games, searches = lookup_searches(bg_ids, source, catalog)
+    for search in searches:
+        add_lookup_hits(games, es_client.search(**search)['hits']['hits'])
+    return games
+
+# same as get_games_by_ids but keeps the order of bg_ids
+# missing boardgames come back as None
+def hydrate_games(es_client, bg_ids, source=None, catalog=None):
+    return order_games(get_games_by_ids(es_client, bg_ids, source, catalog), bg_ids)
+
+# catalog games and the search arguments for the ids left to look up
+def lookup_searches(bg_ids, source=None, catalog=None):
+    unique_ids = []
+    seen = set()
+    for bg_id in bg_ids:
+        try:
+            bg_id = int(bg_id)
+        except (TypeError, ValueError):
+            continue
+        if bg_id not in seen:
+            seen.add(bg_id)
+            unique_ids.append(bg_id)
+
+    # hits are matched back to bg_ids through the id field
+    if source != None and 'id' not in source:
+        source = list(source) + ['id']
+
+    games = {}
+    if catalog != None:
+        missing_ids = []
+        for bg_id in unique_ids:
+            hit = catalog.hit(bg_id, source)
+            if hit == None:
+                missing_ids.append(bg_id)
+            else:
+                games[bg_id] = hit
+        unique_ids = missing_ids
+
+    searches = []
+    for start in range(0, len(unique_ids), MAX_LOOKUP_SIZE):
+        chunk = unique_ids[start:start + MAX_LOOKUP_SIZE]
+        search = {
+            'index': 'bgg',
+            'query': {
+                "constant_score" : {
+                        "filter" : {
+                            "terms" : {
+                                "id" : chunk
+                            }
+                        }
+                    }
+            },
+            'size': len(chunk)
+        }
+        if source != None:
+            search['source'] = source
+        searches.append(search)
+    return games, searches
+
+def add_lookup_hits(games, hits):
+    for hit in hits:
+        games[int(hit['_source']['id'])] = hit
+
+def order_games(games, bg_ids):
+    ordered = []
+    for bg_id in bg_ids:
+        try:
+            ordered.append(games.get(int(bg_id)))
+        except (TypeError, ValueError):
+            ordered.append(None)
+    return ordered
+
+# more_like_this like entries for hits from get_games_by_ids
+# catalog games are sent as artificial documents, an index built by the notebook
+# has generated ids so the _id of a catalog hit may not exist in elasticsearch
+def like_documents(hits, catalog=None):
+    like = []
+    for hit in hits:
+        if catalog != None and hit['_source']['id'] in catalog:
+            like.append({'_index': 'bgg', 'doc': catalog.get(hit['_source']['id'], MLT_FIELDS)})
+        elif '_id' in hit:
+            like.append({'_id': hit['_id']})
+    return like
+
+# like entries straight from the catalog, no lookup has to finish first
+def catalog_like_documents(catalog, bg_ids):
+    return [{'_index': 'bgg', 'doc': catalog.get(bg_id, MLT_FIELDS)} for bg_id in bg_ids if bg_id in catalog]
+
@@ -0,0 +1,133 @@
+# collection recommendations from precomputed game vectors
+# every game is embedded once by the batch job below, a collection is then
+# scored as the centroid of a bounded sample of its games (or a few k-means
+# clusters of them) against all game vectors with one matrix product, so the
+# time does not grow with the size of the collection
+#
+# usage: python game_vectors.py [--output game_vectors.npz] [--batch 64]
+import argparse
+import os
+
+import numpy as np
+
+from id_index import IdIndex, load_id_index
+
+GAME_VECTORS_PATH = 'game_vectors.npz'
+# games of a collection used for the centroid, larger collections are sampled
+MAX_COLLECTION_SAMPLE = 256
+KMEANS_ITERATIONS = 10
+
+# text embedded for one game, the same fields more_like_this compares
+def game_text(game):
+    parts = [game.get('name'), game.get('boardgame_subdomain'), game.get('description')]
+    return '\n'.join(str(part) for part in parts if part != None)
+
+# embeddings is any langchain Embeddings, embed_documents is called per batch
+def build_game_vectors(embeddings, catalog, batch=64):
+    ids = np.array(sorted(catalog.positions), dtype=np.int64)
+    vectors = []
+    for start in range(0, len(ids), batch):
+        games = catalog.get_many([int(bg_id) for bg_id in ids[start:start + batch]], ['name', 'boardgame_subdomain', 'description'])
+        vectors.extend(embeddings.embed_documents([game_text(game) for game in games]))
+    return GameVectors(ids, np.asarray(vectors, dtype=np.float32))
+
+# unit length rows, all zero rows stay zero
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+# centers of the points, starting from points spread evenly over the input
+def kmeans(points, clusters, iterations=KMEANS_ITERATIONS):
+    clusters = min(clusters, len(points))
+    centers = points[np.linspace(0, len(points) - 1, clusters).astype(int)]
+    for _ in range(iterations):
+        labels = np.argmax(points @ centers.T, axis=1)
+        for cluster in range(clusters):
+            members = points[labels == cluster]
+            if len(members) != 0:
+                centers[cluster] = members.mean(axis=0)
+        centers = normalize_rows(centers)
+    return centers
+
+# sorted ids with one unit vector each
+class GameVectors(IdIndex):
+    ARRAYS = ['ids', 'vectors']
+
+    def __init__(self, ids, vectors):
+        IdIndex.__init__(self, ids)
+        self.vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+    # [(bg_id, score)] of the k games closest to the collection, best first
+    # clusters > 1 takes the best games of every cluster in turn, so a
+    # collection of different kinds of games gets some of each
+    # returns None when no game of bg_ids has a vector
+    def recommend(self, bg_ids, k=10, clusters=1):
+        positions = [position for position in (self.position(bg_id) for bg_id in bg_ids) if position != None]
+        if len(positions) == 0:
+            return None
+        sample = positions
+        if len(sample) > MAX_COLLECTION_SAMPLE:
+            sample = sample[::len(sample) // MAX_COLLECTION_SAMPLE + 1]
+        points = self.vectors[sample]
+        if clusters > 1:
+            centers = kmeans(points, clusters)
+        else:
+            centers = normalize_rows(points.mean(axis=0, keepdims=True))
+
+        scores = self.vectors @ centers.T
+        scores[positions] = -np.inf
+        candidates = min(k, len(self.ids))
+        ranked = []
+        for cluster in range(len(centers)):
+            top = np.argpartition(-scores[:, cluster], candidates - 1)[:candidates]
+            ranked.append(top[np.argsort(-scores[top, cluster])])
+
+        recommendations = []
+        seen = set()
+        for rank in range(candidates):
+            for cluster in range(len(centers)):
+                position = ranked[cluster][rank]
+                score = scores[position, cluster]
+                if position in seen or score == -np.inf:
+                    continue
+                seen.add(position)
+                recommendations.append((int(self.ids[position]), float(score)))
+        return recommendations[:k]
+
+# the saved vectors, or None when they are missing or were built for another catalog
+def load_game_vectors(path, catalog):
+    return load_id_index(GameVectors, path, catalog)
+
+# recommendation hits of a collection in the shape of the elasticsearch hits,
+# None when there are no vectors for it so the caller can run more_like_this
+def vector_hits(game_vectors, catalog, bg_ids, k=10, clusters=1):
+    if game_vectors == None:
+        return None
+    recommendations = game_vectors.recommend(bg_ids, k, clusters)
+    if recommendations == None:
+        return None
+    return [dict(catalog.hit(bg_id), _score=score) for bg_id, score in recommendations if bg_id in catalog]
+
+def main():
+    import pandas as pd
+    from dotenv import load_dotenv
+    from langchain_community.embeddings import OllamaEmbeddings
+
+    from catalog import GameCatalog
+
+    parser = argparse.ArgumentParser(description='embed every game for the collection recommendations')
+    parser.add_argument('--parquet', default='bgg_games_info_cleaned.parquet.gzip')
+    parser.add_argument('--output', default=GAME_VECTORS_PATH)
+    parser.add_argument('--batch', type=int, default=64)
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    embeddings = OllamaEmbeddings(model='nomic-embed-text', base_url=os.environ.get('EMBEDDED_URL'))
+    catalog = GameCatalog(pd.read_parquet(args.parquet))
+    game_vectors = build_game_vectors(embeddings, catalog, args.batch)
+    game_vectors.save(args.output)
+    print('saved', len(game_vectors.ids), 'vectors to', args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+# base of the precomputed per-game files, sorted game ids and numpy arrays with
+# one row per id, ARRAYS names the constructor arguments saved to the .npz file
+class IdIndex:
+    ARRAYS = ['ids']
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.positions = {int(bg_id): position for position, bg_id in enumerate(ids)}
+
+    def __contains__(self, bg_id):
+        return self.position(bg_id) != None
+
+    def position(self, bg_id):
+        try:
+            return self.positions.get(int(bg_id))
+        except (TypeError, ValueError):
+            return None
+
+    # ids the file was built for, to tell whether it still matches the catalog
+    def matches(self, catalog):
+        return len(self.ids) == len(catalog) and all(int(bg_id) in catalog for bg_id in self.ids)
+
+    def save(self, path):
+        np.savez_compressed(path, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    # arrays missing from an older file are left to the constructor defaults
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(**{name: data[name] for name in cls.ARRAYS if name in data})
+
+# the saved file as cls, or None when it is missing or was built for another catalog
+def load_id_index(cls, path, catalog):
+    if not os.path.exists(path):
+        return None
+    index = cls.load(path)
+    if not index.matches(catalog):
+        return None
+    return index
@@ -0,0 +1,134 @@
+# versioned schema migrations
+# every migration runs once, in order, and its version is recorded in the
+# schema_version table; add new ones to the end of MIGRATIONS, never edit
+# one that has been released
+# migrations use frozen tables and plain statements, never the models, and
+# models.py must declare the schema the last migration leaves behind
+#
+# usage: flask --app app migrate, or python migrations.py [--url sqlite:///dev.db]
+import argparse
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, MetaData, PrimaryKeyConstraint, String, Table, Text
+from sqlalchemy import create_engine, inspect, select
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+# the tables as app.py first declared them, frozen here so migration 1 creates
+# the same schema whatever the models look like today
+schema_v1 = MetaData()
+Table('user', schema_v1,
+    Column('id', Integer, primary_key=True),
+    Column('public_id', String(50), unique=True, nullable=False),
+    Column('username', String(100), nullable=False),
+    Column('email', String(70), unique=True, nullable=False),
+    Column('password', Text(), nullable=False),
+    Column('roles', String(100), nullable=False)
+)
+Table('collection', schema_v1,
+    Column('id', Integer, primary_key=True),
+    Column('public_id', String(50), unique=True, nullable=False),
+    Column('name', String(100), nullable=False),
+    Column('user_id', String(50), ForeignKey('user.public_id'), nullable=False)
+)
+Table('item', schema_v1,
+    Column('bg_id', Integer, nullable=False),
+    Column('public_id', String(50), unique=True, nullable=False),
+    Column('collection_id', String(50), ForeignKey('collection.public_id'), nullable=False),
+    PrimaryKeyConstraint('bg_id', 'collection_id')
+)
+Table('history', schema_v1,
+    Column('id', Integer, primary_key=True),
+    Column('public_id', String(50), unique=True, nullable=False),
+    Column('user_id', String(50), ForeignKey('user.public_id'), nullable=False),
+    Column('name', String(100), nullable=False),
+    Column('game', Integer, nullable=False)
+)
+Table('message', schema_v1,
+    Column('id', Integer, primary_key=True),
+    Column('public_id', String(50), unique=True, nullable=False),
+    Column('chat_id', String(50), ForeignKey('history.public_id'), nullable=False),
+    Column('is_human', Boolean, nullable=False),
+    Column('date', DateTime, nullable=False),
+    Column('message', Text, nullable=False)
+)
+Table('rulebook', schema_v1,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(50), nullable=False),
+    Column('qdrant', String(50), nullable=False),
+    Column('image', Text, nullable=False),
+    Column('link', Text)
+)
+
+# CREATE INDEX unless the table already has an index of that name,
+# e.g. from a database created with db.create_all()
+def create_index(connection, name, table, columns):
+    if name in [index['name'] for index in inspect(connection).get_indexes(table)]:
+        return
+    quote = connection.dialect.identifier_preparer.quote
+    connection.exec_driver_sql('CREATE INDEX ' + quote(name) + ' ON ' + quote(table) + ' (' + ', '.join(quote(c) for c in columns) + ')')
+
+# the tables of schema_v1, existing tables are left untouched
+def create_tables(connection):
+    schema_v1.create_all(connection)
+
+# indexes for the hot lookups
+def add_lookup_indexes(connection):
+    create_index(connection, 'ix_item_collection_id_bg_id', 'item', ['collection_id', 'bg_id'])
+    create_index(connection, 'ix_message_chat_id_date', 'message', ['chat_id', 'date'])
+    create_index(connection, 'ix_history_user_id_game', 'history', ['user_id', 'game'])
+    create_index(connection, 'ix_collection_user_id', 'collection', ['user_id'])
+
+MIGRATIONS = [
+    (1, 'create tables', create_tables),
+    (2, 'add lookup indexes', add_lookup_indexes),
+]
+
+def current_version(connection):
+    schema_version.create(connection, checkfirst=True)
+    versions = [version for (version,) in connection.execute(select(schema_version.c.version))]
+    return max(versions, default=0)
+
+# applies the migrations after the recorded version up to target, each in its
+# own transaction, returns the versions applied
+def migrate(engine, target=None):
+    with engine.begin() as connection:
+        version = current_version(connection)
+
+    applied = []
+    for number, name, upgrade in MIGRATIONS:
+        if number <= version or (target != None and number > target):
+            continue
+        with engine.begin() as connection:
+            upgrade(connection)
+            connection.execute(schema_version.insert().values(
+                version=number,
+                name=name,
+                applied_at=datetime.now(timezone.utc).replace(tzinfo=None)
+            ))
+        applied.append(number)
+    return applied
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv(override=True)
+    parser = argparse.ArgumentParser(description='migrate the database schema')
+    parser.add_argument('--url', default=None, help='database url, defaults to the mysql database of app.py')
+    parser.add_argument('--target', type=int, default=None)
+    args = parser.parse_args()
+
+    url = args.url
+    if url == None:
+        url = 'mysql+mysqldb://'+os.environ.get('MYSQL_USERNAME')+':'+os.environ.get('MYSQL_PASSWORD')+'@'+os.environ.get('MYSQL_URL')+'/boardbuddy'
+    applied = migrate(create_engine(url), args.target)
+    print('applied', applied if len(applied) != 0 else 'nothing, schema is up to date')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+from flask_sqlalchemy import SQLAlchemy
+
+from db_routing import RoutingSession
+
+# creates SQLALCHEMY object
+# read_only views query the replica bind through RoutingSession
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Database ORMs
+class User(db.Model):
+    __tablename__ = "user"
+    id = db.Column(db.Integer, primary_key = True)
+    public_id = db.Column(db.String(50), unique = True, nullable=False)
+    username = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(70), unique = True, nullable=False)
+    password = db.Column(db.Text(), nullable=False)
+    roles = db.Column(db.String(100), nullable=False)
+    collections = db.relationship('Collection', backref='user', lazy=True, cascade="all,delete")
+    chats = db.relationship('ChatHistory', backref='user', lazy=True, cascade="all,delete")
+
+class Collection(db.Model):
+    __tablename__ = "collection"
+    id = db.Column(db.Integer, primary_key = True)
+    public_id = db.Column(db.String(50), unique = True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.String(50), db.ForeignKey('user.public_id'), nullable=False)
+    boardgames = db.relationship('CollectionItem', backref='collection', lazy=True, cascade="all,delete")
+    __table_args__ = (
+        db.Index('ix_collection_user_id', user_id),
+    )
+
+class CollectionItem(db.Model):
+    __tablename__ = "item"
+    # id = db.Column(db.Integer, primary_key = True)
+    bg_id = db.Column(db.Integer, nullable=False)
+    public_id = db.Column(db.String(50), unique = True, nullable=False)
+    collection_id = db.Column(db.String(50), db.ForeignKey('collection.public_id'), nullable=False)
+    __table_args__ = (
+        db.PrimaryKeyConstraint(
+            bg_id, collection_id,
+        ),
+        # the primary key starts with bg_id, items are read by collection
+        db.Index('ix_item_collection_id_bg_id', collection_id, bg_id),
+    )
+
+class ChatHistory(db.Model):
+    __tablename__ = "history"
+    id = db.Column(db.Integer, primary_key = True)
+    public_id = db.Column(db.String(50), unique = True, nullable=False)
+    user_id = db.Column(db.String(50), db.ForeignKey('user.public_id'), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    game = db.Column(db.Integer, nullable=False)
+    chats = db.relationship('ChatMessage', backref='history', lazy=True, cascade="all,delete")
+    __table_args__ = (
+        db.Index('ix_history_user_id_game', user_id, game),
+    )
+
+class ChatMessage(db.Model):
+    __tablename__ = "message"
+    id = db.Column(db.Integer, primary_key = True)
+    public_id = db.Column(db.String(50), unique = True, nullable=False)
+    chat_id = db.Column(db.String(50), db.ForeignKey('history.public_id'), nullable=False)
+    is_human = db.Column(db.Boolean, nullable=False)
+    date = db.Column(db.DateTime, nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    __table_args__ = (
+        # messages of a chat are always read in date order
+        db.Index('ix_message_chat_id_date', chat_id, date),
+    )
+
+class Rulebook(db.Model):
+    __tablename__ = "rulebook"
+    id = db.Column(db.Integer, primary_key = True)
+    name = db.Column(db.String(50), nullable=False)
+    qdrant = db.Column(db.String(50), nullable=False)
+    image = db.Column(db.Text, nullable=False)
+    link = db.Column(db.Text)
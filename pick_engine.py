@@ -0,0 +1,80 @@
+import numpy as np
+
+from pick_filter import is_pick_value, pick_filter_mask
+
+# random_pick pushed down to elasticsearch: one search filters the collection's
+# games and samples them with random_score, so only the picked games come back
+
+PICK_SOURCE = ['id', 'name', 'image', 'min_playtime', 'max_playtime', 'min_players', 'max_players', 'age']
+
+# range filters matching pick_filter_min_age ... pick_filter_max_players
+def build_pick_filters(min_age, min_playtime, max_playtime, min_players, max_players):
+    filters = []
+    if is_pick_value(min_age):
+        filters.append({ "range": { "age": { "lte": min_age }}})
+    if is_pick_value(min_playtime):
+        filters.append({ "range": { "min_playtime": { "gte": min_playtime }}})
+    if is_pick_value(max_playtime):
+        filters.append({ "range": { "max_playtime": { "lte": max_playtime }}})
+    if is_pick_value(min_players):
+        filters.append({ "range": { "min_players": { "lte": min_players }}})
+    if is_pick_value(max_players):
+        filters.append({ "range": { "max_players": { "gte": max_players }}})
+    return filters
+
+def build_pick_query(bg_ids, filters):
+    return {
+        "function_score": {
+            "query": {
+                "bool": {
+                    "filter": [{ "terms": { "id": bg_ids }}] + filters
+                }
+            },
+            "random_score": {},
+            "boost_mode": "replace"
+        }
+    }
+
+# up to n distinct random games of bg_ids that pass the filters
+# returns the hits _source in the pick_filter item shape, without public_id
+def pick_games(es_client, bg_ids, n=1, min_age=None, min_playtime=None, max_playtime=None, min_players=None, max_players=None):
+    if len(bg_ids) == 0 or n <= 0:
+        return []
+    filters = build_pick_filters(min_age, min_playtime, max_playtime, min_players, max_players)
+    hits = es_client.search(index='bgg', query=build_pick_query(bg_ids, filters), size=min(n, len(bg_ids)), source=PICK_SOURCE)['hits']['hits']
+    return [to_pick(hit['_source']) for hit in hits]
+
+# same as pick_games over the catalog columns with one vectorized mask
+# returns None when a game is missing from the catalog so the caller can
+# fall back to pick_games
+def pick_from_catalog(catalog, bg_ids, n=1, min_age=None, min_playtime=None, max_playtime=None, min_players=None, max_players=None):
+    positions = [catalog.position(bg_id) for bg_id in bg_ids]
+    if None in positions:
+        return None
+    if len(positions) == 0 or n <= 0:
+        return []
+    positions = np.asarray(positions)
+    columns = {
+        'min_age': catalog.data['age'][positions],
+        'min_playtime': catalog.data['min_playtime'][positions],
+        'max_playtime': catalog.data['max_playtime'][positions],
+        'min_players': catalog.data['min_players'][positions],
+        'max_players': catalog.data['max_players'][positions],
+    }
+    candidates = np.flatnonzero(pick_filter_mask(columns, min_age, min_playtime, max_playtime, min_players, max_players))
+    if len(candidates) == 0:
+        return []
+    picked = np.random.choice(candidates, size=min(n, len(candidates)), replace=False)
+    return [to_pick(catalog.get(bg_ids[i], PICK_SOURCE)) for i in picked]
+
+def to_pick(game):
+    return {
+        'bg_id': int(game['id']),
+        'name': game['name'],
+        'image': game['image'],
+        'min_playtime': game['min_playtime'],
+        'max_playtime': game['max_playtime'],
+        'min_players': game['min_players'],
+        'max_players': game['max_players'],
+        'min_age': game['age']
+    }
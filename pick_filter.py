@@ -1,3 +1,5 @@
+import numpy as np
+
 def pick_filter_min_age(return_list, min_age):
     if min_age and min_age != 0 and type(min_age) == int:
         return_list = [item for item in return_list if item["min_age"] <= min_age]
@@ -21,4 +23,25 @@ def pick_filter_min_players(return_list, min_players):
 def pick_filter_max_players(return_list, max_players):
     if max_players and max_players != 0 and type(max_players) == int:
         return_list = [item for item in return_list if item["max_players"] >= max_players]
-    return return_list
\ No newline at end of file
+    return return_list
+
+# only non-zero int values filter, same check as the functions above
+def is_pick_value(value):
+    return bool(value) and type(value) == int
+
+# columnar version of the five filters above
+# columns maps min_age, min_playtime, max_playtime, min_players and max_players
+# to equally long arrays, returns one boolean mask over their rows
+def pick_filter_mask(columns, min_age, min_playtime, max_playtime, min_players, max_players):
+    mask = np.ones(len(columns['min_age']), dtype=bool)
+    if is_pick_value(min_age):
+        mask &= np.asarray(columns['min_age']) <= min_age
+    if is_pick_value(min_playtime):
+        mask &= np.asarray(columns['min_playtime']) >= min_playtime
+    if is_pick_value(max_playtime):
+        mask &= np.asarray(columns['max_playtime']) <= max_playtime
+    if is_pick_value(min_players):
+        mask &= np.asarray(columns['min_players']) <= min_players
+    if is_pick_value(max_players):
+        mask &= np.asarray(columns['max_players']) >= max_players
+    return mask
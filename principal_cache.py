@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event
+
+from search_cache import SharedGeneration
+
+# what token_required hands to the routes, a plain copy of the user row
+# so it can outlive the request session
+Principal = namedtuple('Principal', ['id', 'public_id', 'username', 'email', 'roles'])
+
+def to_principal(user):
+    return Principal(user.id, user.public_id, user.username, user.email, user.roles)
+
+# principals by public_id for ttl seconds, unknown users are not cached
+# invalidate() bumps a generation kept in store (see SharedGeneration), so every
+# worker sharing it drops its principals within generation_check seconds
+# changes that never call invalidate, e.g. plain SQL, show up after ttl at most
+class PrincipalCache:
+    def __init__(self, ttl=5, max_size=10000, store=None, prefix='principals:', generation_check=1.0, store_errors=()):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.principals = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # a load that overlaps an invalidate is not stored either
+        self.generation = SharedGeneration(store, prefix + 'generation', generation_check, store_errors)
+
+    # cached principal or loader(public_id), which returns a Principal or None
+    def get(self, public_id, loader):
+        generation = self.generation.current()
+        now = time.monotonic()
+        with self.lock:
+            entry = self.principals.get(public_id)
+            if entry != None and entry[1] > now and entry[2] == generation:
+                self.principals.move_to_end(public_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        principal = loader(public_id)
+        if principal != None:
+            with self.lock:
+                # the row may have changed after the loader read it
+                if self.generation.value != generation:
+                    return principal
+                self.principals[public_id] = (principal, now + self.ttl, generation)
+                self.principals.move_to_end(public_id)
+                while len(self.principals) > self.max_size:
+                    self.principals.popitem(last=False)
+        return principal
+
+    # call when a user is deleted or changed, e.g. new roles
+    def invalidate(self, public_id):
+        self.generation.bump()
+        with self.lock:
+            if self.principals.pop(public_id, None) != None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'ttl': self.ttl,
+                'size': len(self.principals),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups != 0 else 0.0
+            }
+
+# drops the cached principal whenever a row of the user model is updated or deleted
+# through the session, bulk Query.update()/delete() and plain SQL statements skip
+# these events and must call cache.invalidate for every public_id they touch
+# returns the listener, for event.remove(model, 'after_update'/'after_delete', listener)
+def invalidate_on_change(cache, model):
+    def invalidate(mapper, connection, target):
+        cache.invalidate(target.public_id)
+    event.listen(model, 'after_update', invalidate)
+    event.listen(model, 'after_delete', invalidate)
+    return invalidate
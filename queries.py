@@ -0,0 +1,239 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, insert, or_
+
+from cursor_codec import encode_token, decode_token
+from models import db, Collection, CollectionItem, ChatHistory, ChatMessage
+
+# every collection of a user with its item count and first thumbnail_count bg_ids
+# answered by one query, the user's items are ranked per collection with window functions
+def get_collection_summaries(user_id, thumbnail_count=3):
+    ranked_items = db.session.query(
+            CollectionItem.collection_id,
+            CollectionItem.bg_id,
+            func.row_number().over(
+                partition_by=CollectionItem.collection_id,
+                order_by=CollectionItem.bg_id
+            ).label('rank'),
+            func.count().over(
+                partition_by=CollectionItem.collection_id
+            ).label('game_count')
+        )\
+        .join(Collection, Collection.public_id == CollectionItem.collection_id)\
+        .filter(Collection.user_id == user_id)\
+        .subquery()
+
+    rows = db.session.query(
+            Collection.name,
+            Collection.public_id,
+            ranked_items.c.bg_id,
+            ranked_items.c.game_count
+        )\
+        .outerjoin(ranked_items, and_(
+            ranked_items.c.collection_id == Collection.public_id,
+            ranked_items.c.rank <= thumbnail_count
+        ))\
+        .filter(Collection.user_id == user_id)\
+        .order_by(Collection.id, ranked_items.c.rank)\
+        .all()
+
+    summaries = []
+    by_public_id = {}
+    for name, public_id, bg_id, game_count in rows:
+        summary = by_public_id.get(public_id)
+        if summary == None:
+            summary = {
+                'name': name,
+                'public_id': public_id,
+                'game_count': game_count or 0,
+                'bg_ids': []
+            }
+            by_public_id[public_id] = summary
+            summaries.append(summary)
+        if bg_id != None:
+            summary['bg_ids'].append(bg_id)
+    return summaries
+
+# the last limit messages of a chat, oldest first
+# reads at most limit rows through the (chat_id, date) index however long the chat is
+def get_recent_messages(chat_id, limit):
+    return get_message_page(chat_id, limit)[0]
+
+# one page of a chat, the limit messages before the (date, id) of before,
+# or the latest ones without it, oldest first
+# returns the messages and whether older messages are left
+def get_message_page(chat_id, limit, before=None):
+    query = ChatMessage.query\
+        .filter_by(chat_id = chat_id)
+    if before != None:
+        date, message_id = before
+        query = query.filter(or_(
+            ChatMessage.date < date,
+            and_(ChatMessage.date == date, ChatMessage.id < message_id)
+        ))
+    messages = query\
+        .order_by(ChatMessage.date.desc(), ChatMessage.id.desc())\
+        .limit(limit + 1)\
+        .all()
+    more = len(messages) > limit
+    messages = messages[:limit]
+    messages.reverse()
+    return messages, more
+
+# one page of the chats of a user, newest first, the limit chats with an id
+# below before_id or the latest ones without it
+# returns the chats and whether older chats are left
+def get_history_page(user_id, limit, before_id=None):
+    query = ChatHistory.query\
+        .filter_by(user_id = user_id)
+    if before_id != None:
+        query = query.filter(ChatHistory.id < before_id)
+    history = query\
+        .order_by(ChatHistory.id.desc())\
+        .limit(limit + 1)\
+        .all()
+    return history[:limit], len(history) > limit
+
+# opaque token holding the sort values of the last row of a page
+def encode_keyset_cursor(values):
+    return encode_token(values)
+
+# sort values of a token, None for an empty token (first page)
+# raises ValueError for tokens that were not made by encode_keyset_cursor
+def decode_keyset_cursor(token):
+    values = decode_token(token)
+    if values == None:
+        return None
+    if type(values) != list:
+        raise ValueError('invalid cursor')
+    return values
+
+def message_cursor(message):
+    return encode_keyset_cursor([message.date.isoformat(), message.id])
+
+# (date, id) of a get_message_page cursor
+def decode_message_cursor(token):
+    values = decode_keyset_cursor(token)
+    if values == None:
+        return None
+    try:
+        date, message_id = values
+        if type(message_id) != int:
+            raise TypeError
+        return datetime.fromisoformat(date), message_id
+    except (ValueError, TypeError):
+        raise ValueError('invalid cursor')
+
+def history_cursor(history):
+    return encode_keyset_cursor([history.id])
+
+# id of a get_history_page cursor
+def decode_history_cursor(token):
+    values = decode_keyset_cursor(token)
+    if values == None:
+        return None
+    if len(values) != 1 or type(values[0]) != int:
+        raise ValueError('invalid cursor')
+    return values[0]
+
+# every collection of a user and whether it already holds bg_id, in one query
+def get_collections_with_game(user_id, bg_id):
+    try:
+        bg_id = int(bg_id)
+    except (TypeError, ValueError):
+        bg_id = None
+
+    have = db.session.query(CollectionItem)\
+        .filter(
+            CollectionItem.collection_id == Collection.public_id,
+            CollectionItem.bg_id == bg_id
+        )\
+        .exists()
+
+    rows = db.session.query(
+            Collection.name,
+            Collection.public_id,
+            have.label('have')
+        )\
+        .filter(Collection.user_id == user_id)\
+        .order_by(Collection.id)\
+        .all()
+
+    return [{'name': name, 'public_id': public_id, 'have': bool(have)} for name, public_id, have in rows]
+
+# largest number of bg_ids accepted by one bulk add or remove
+MAX_BULK_ITEMS = 1000
+
+# bg_ids of a bulk request as ints, None for values that are not a game id
+def parse_bg_ids(bg_ids):
+    parsed = []
+    for bg_id in bg_ids:
+        try:
+            parsed.append(None if isinstance(bg_id, bool) else int(bg_id))
+        except (TypeError, ValueError):
+            parsed.append(None)
+    return parsed
+
+# adds every new game of bg_ids to a collection, one select for the games it
+# already holds and one insert for the rest, the caller commits
+# returns one {'bg_id', 'status'} per requested id: added, duplicate or invalid
+def add_collection_items(collection_id, bg_ids):
+    parsed = parse_bg_ids(bg_ids)
+    requested = set(bg_id for bg_id in parsed if bg_id != None)
+    existing = set()
+    if len(requested) != 0:
+        existing = set(bg_id for (bg_id,) in db.session.query(CollectionItem.bg_id)\
+            .filter(
+                CollectionItem.collection_id == collection_id,
+                CollectionItem.bg_id.in_(requested)
+            ))
+
+    outcomes = []
+    rows = []
+    for raw, bg_id in zip(bg_ids, parsed):
+        if bg_id == None:
+            outcomes.append({'bg_id': raw, 'status': 'invalid'})
+        elif bg_id in existing:
+            outcomes.append({'bg_id': bg_id, 'status': 'duplicate'})
+        else:
+            existing.add(bg_id)
+            rows.append({'bg_id': bg_id, 'public_id': str(uuid.uuid4()), 'collection_id': collection_id})
+            outcomes.append({'bg_id': bg_id, 'status': 'added'})
+
+    if len(rows) != 0:
+        db.session.execute(insert(CollectionItem), rows)
+    return outcomes
+
+# removes the games of bg_ids from a collection with one select and one delete,
+# the caller commits
+# returns one {'bg_id', 'status'} per requested id: removed, not_found or invalid
+def remove_collection_items(collection_id, bg_ids):
+    parsed = parse_bg_ids(bg_ids)
+    requested = set(bg_id for bg_id in parsed if bg_id != None)
+    existing = set()
+    if len(requested) != 0:
+        existing = set(bg_id for (bg_id,) in db.session.query(CollectionItem.bg_id)\
+            .filter(
+                CollectionItem.collection_id == collection_id,
+                CollectionItem.bg_id.in_(requested)
+            ))
+
+    outcomes = []
+    removed = set()
+    for raw, bg_id in zip(bg_ids, parsed):
+        if bg_id == None:
+            outcomes.append({'bg_id': raw, 'status': 'invalid'})
+        elif bg_id in existing and bg_id not in removed:
+            removed.add(bg_id)
+            outcomes.append({'bg_id': bg_id, 'status': 'removed'})
+        else:
+            outcomes.append({'bg_id': bg_id, 'status': 'not_found'})
+
+    if len(removed) != 0:
+        db.session.execute(delete(CollectionItem)\
+            .where(
+                CollectionItem.collection_id == collection_id,
+                CollectionItem.bg_id.in_(removed)
+            ))
+    return outcomes
@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+# ready retrievers keyed by the rulebook qdrant collection name
+# factory(collection_name) builds one, the least recently used is evicted
+# once more than max_size collections are held
+class RetrieverPool:
+    def __init__(self, factory, max_size=16):
+        self.factory = factory
+        self.max_size = max_size
+        self.retrievers = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.retrievers)
+
+    def __contains__(self, collection_name):
+        return collection_name in self.retrievers
+
+    def get(self, collection_name):
+        with self.lock:
+            retriever = self.retrievers.get(collection_name)
+            if retriever != None:
+                self.retrievers.move_to_end(collection_name)
+                self.hits += 1
+                return retriever
+            self.misses += 1
+
+        # built outside the lock so a slow qdrant does not block other rulebooks
+        retriever = self.factory(collection_name)
+
+        with self.lock:
+            # another request may have built the same collection meanwhile
+            if collection_name in self.retrievers:
+                self.retrievers.move_to_end(collection_name)
+                return self.retrievers[collection_name]
+            self.retrievers[collection_name] = retriever
+            while len(self.retrievers) > self.max_size:
+                self.retrievers.popitem(last=False)
+                self.evictions += 1
+            return retriever
+
+    # builds the retrievers up front, e.g. for every rulebook at startup
+    def warm_up(self, collection_names):
+        for collection_name in collection_names:
+            self.get(collection_name)
+
+    def evict(self, collection_name):
+        with self.lock:
+            self.retrievers.pop(collection_name, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.retrievers),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
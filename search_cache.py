@@ -0,0 +1,166 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# key for one /search request built from what is actually sent to elasticsearch,
+# so parameters the build_filter functions drop or normalize share an entry
+def search_cache_key(query, query_term, page, size, search_args):
+    canonical = json.dumps({
+        'query': query,
+        'text': query_term,
+        'from': page,
+        'size': size,
+        'args': search_args
+    }, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+# in-process stand-in for a shared store such as redis, same get/set/incr calls
+class LocalStore:
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        with self.lock:
+            entry = self.values.get(name)
+            if entry == None:
+                return None
+            value, expires = entry
+            if expires != None and expires <= time.monotonic():
+                del self.values[name]
+                return None
+            return value
+
+    def set(self, name, value, ex=None):
+        with self.lock:
+            self.values[name] = (value, time.monotonic() + ex if ex != None else None)
+
+    def incr(self, name):
+        with self.lock:
+            value, expires = self.values.get(name, (0, None))
+            value = int(value) + 1
+            self.values[name] = (value, expires)
+            return value
+
+# a counter shared through store, bump() in one process is seen by current()
+# in the others within check seconds, a plain local counter without a store
+# store_errors, e.g. (redis.RedisError,), keep the last known value instead of failing
+class SharedGeneration:
+    def __init__(self, store, name, check=1.0, store_errors=()):
+        self.store = store
+        self.name = name
+        self.check = check
+        self.store_errors = store_errors
+        self.value = 0
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+    def current(self):
+        if self.store == None:
+            return self.value
+        now = time.monotonic()
+        if now - self.checked < self.check:
+            return self.value
+        self.checked = now
+        try:
+            value = int(self.store.get(self.name) or 0)
+        except self.store_errors:
+            return self.value
+        with self.lock:
+            self.value = value
+            return value
+
+    # an unreachable store only moves this process to a new generation
+    def bump(self):
+        with self.lock:
+            if self.store != None:
+                try:
+                    self.value = int(self.store.incr(self.name))
+                    return self.value
+                except self.store_errors:
+                    pass
+            self.value += 1
+            return self.value
+
+# /search responses in an LRU with ttl, optionally shared through store
+# invalidate() starts a new generation, e.g. after the index is rebuilt,
+# and other processes sharing the store pick it up within generation_check seconds
+# store_errors raised by the store count as a miss, the search itself still runs
+class SearchCache:
+    def __init__(self, ttl=300, max_size=1000, store=None, prefix='search:', generation_check=1.0, store_errors=()):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.store = store
+        self.prefix = prefix
+        self.store_errors = store_errors
+        self.generation = SharedGeneration(store, prefix + 'generation', generation_check, store_errors)
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        generation = self.generation.current()
+        now = time.monotonic()
+        with self.lock:
+            entry = self.responses.get(key)
+            if entry != None and entry[1] > now and entry[2] == generation:
+                self.responses.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.store != None:
+            try:
+                value = self.store.get(self.store_key(key, generation))
+            except self.store_errors:
+                value = None
+            if value != None:
+                response = json.loads(value)
+                self.remember(key, response, generation)
+                with self.lock:
+                    self.store_hits += 1
+                return response
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, response):
+        generation = self.generation.value
+        self.remember(key, response, generation)
+        if self.store != None:
+            try:
+                self.store.set(self.store_key(key, generation), json.dumps(response, default=str), ex=self.ttl)
+            except self.store_errors:
+                pass
+
+    def invalidate(self):
+        with self.lock:
+            self.responses = OrderedDict()
+        self.generation.bump()
+
+    def remember(self, key, response, generation):
+        with self.lock:
+            self.responses[key] = (response, time.monotonic() + self.ttl, generation)
+            self.responses.move_to_end(key)
+            while len(self.responses) > self.max_size:
+                self.responses.popitem(last=False)
+
+    def store_key(self, key, generation):
+        return self.prefix + str(generation) + ':' + key
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                'ttl': self.ttl,
+                'size': len(self.responses),
+                'generation': self.generation.value,
+                'hits': self.hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.store_hits) / lookups if lookups != 0 else 0.0
+            }
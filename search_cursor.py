@@ -0,0 +1,41 @@
+from cursor_codec import encode_token, decode_token
+
+# how long elasticsearch keeps the point in time between two pages
+CURSOR_KEEP_ALIVE = '5m'
+# score order with the point in time tiebreaker, search_after needs a total order
+CURSOR_SORT = [{"_score": "desc"}, {"_shard_doc": "asc"}]
+
+# opaque token holding the point in time id and the sort values of the last hit
+def encode_cursor(pit_id, search_after):
+    return encode_token({'pit': pit_id, 'after': search_after})
+
+# (pit_id, search_after) of a token, (None, None) for an empty token (first page)
+# raises ValueError for tokens that were not made by encode_cursor
+def decode_cursor(token):
+    data = decode_token(token)
+    if data == None:
+        return None, None
+    try:
+        pit_id = data['pit']
+        search_after = data['after']
+    except (TypeError, KeyError):
+        raise ValueError('invalid cursor')
+    if type(pit_id) != str or type(search_after) != list:
+        raise ValueError('invalid cursor')
+    return pit_id, search_after
+
+# search arguments for one cursor page
+def build_cursor_args(pit_id, search_after):
+    cursor_args = {
+        'pit': {'id': pit_id, 'keep_alive': CURSOR_KEEP_ALIVE},
+        'sort': CURSOR_SORT
+    }
+    if search_after != None:
+        cursor_args['search_after'] = search_after
+    return cursor_args
+
+# token for the page after hits, None once the last page is reached
+def next_cursor(pit_id, hits, size):
+    if len(hits) == 0 or len(hits) < size:
+        return None
+    return encode_cursor(pit_id, hits[-1]['sort'])
@@ -0,0 +1,31 @@
+# builds the /search results straight from the elasticsearch hits
+
+# comma separated fields request parameter, e.g. fields=id,name,image,thumbnail
+# unknown fields are dropped, returns None when every column is wanted
+def parse_fields(fields, columns):
+    if fields == None or len(fields) == 0:
+        return None
+    selected = []
+    for field in fields.split(','):
+        field = field.strip()
+        if field in columns and field not in selected:
+            selected.append(field)
+    if len(selected) == 0:
+        return None
+    return selected
+
+# _source filtering so elasticsearch only sends the selected fields
+def build_source(fields):
+    if fields == None:
+        return None
+    return {"includes": fields}
+
+# one dict per hit with the selected columns in column order and the hit _score
+def project_hits(hits, columns):
+    results = []
+    for hit in hits:
+        source = hit['_source']
+        result = {column: source.get(column) for column in columns}
+        result['_score'] = hit['_score']
+        results.append(result)
+    return results
@@ -0,0 +1,122 @@
+# offline "similar games" index for /boardgame/<bg_id>
+# runs the same more_like_this query as the endpoint once for every game of the
+# catalog and stores the top k ids and scores in a compressed numpy file
+#
+# usage: python similar_games.py [--output similar_games.npz] [--k 4] [--batch 100]
+import argparse
+import os
+
+import numpy as np
+
+from game_lookup import MLT_FIELDS, catalog_like_documents
+from id_index import IdIndex, load_id_index
+
+SIMILAR_GAMES_PATH = 'similar_games.npz'
+
+# more_like_this over MLT_FIELDS, shared with the live fallback in /boardgame/<bg_id>
+def build_similar_query(like, bg_id):
+    return {
+        "bool": {
+            "must": {
+                "more_like_this": {
+                    "fields": MLT_FIELDS,
+                    "like": like,
+                    "min_term_freq": 1,
+                    "min_doc_freq": 5,
+                    "max_query_terms": 20
+                }
+            },
+            # artificial like documents do not exclude themselves
+            "must_not": {
+                "term": {
+                    "id": bg_id
+                }
+            }
+        }
+    }
+
+# top k similar games of every catalog game, batch games per msearch request
+def build_similar_games(es_client, catalog, k=4, batch=100):
+    ids = np.array(sorted(catalog.positions), dtype=np.int64)
+    similar = np.full((len(ids), k), -1, dtype=np.int64)
+    scores = np.zeros((len(ids), k), dtype=np.float32)
+    built = np.ones(len(ids), dtype=bool)
+    for start in range(0, len(ids), batch):
+        searches = []
+        for bg_id in ids[start:start + batch]:
+            searches.append({"index": "bgg"})
+            searches.append({
+                "size": k,
+                "_source": ["id"],
+                "query": build_similar_query(catalog_like_documents(catalog, [int(bg_id)]), int(bg_id))
+            })
+        responses = es_client.msearch(searches=searches)['responses']
+        for row, response in enumerate(responses, start):
+            # left out so /boardgame/<bg_id> falls back to the live query
+            if 'error' in response:
+                built[row] = False
+                continue
+            for column, hit in enumerate(response['hits']['hits'][:k]):
+                similar[row, column] = int(hit['_source']['id'])
+                scores[row, column] = hit['_score']
+    return SimilarGames(ids, similar, scores, built)
+
+# sorted ids with one row of similar ids and scores each, -1 pads short rows
+# built is False for the games whose search failed during the build
+class SimilarGames(IdIndex):
+    ARRAYS = ['ids', 'similar', 'scores', 'built']
+
+    def __init__(self, ids, similar, scores, built=None):
+        IdIndex.__init__(self, ids)
+        self.similar = similar
+        self.scores = scores
+        self.built = built if built is not None else np.ones(len(ids), dtype=bool)
+
+    # [(bg_id, score)] most similar first, None for games that were not precomputed
+    def get(self, bg_id):
+        position = self.position(bg_id)
+        if position == None or not self.built[position]:
+            return None
+        return [
+            (int(similar_id), float(score))
+            for similar_id, score in zip(self.similar[position], self.scores[position])
+            if similar_id != -1
+        ]
+
+# the saved index, or None when it is missing or was built for another catalog
+def load_similar_games(path, catalog):
+    return load_id_index(SimilarGames, path, catalog)
+
+# recommendation hits of bg_id in the shape of the elasticsearch hits, None when
+# bg_id or one of its similar games is unknown so the caller can run the live query
+def similar_hits(similar_games, catalog, bg_id):
+    if similar_games == None:
+        return None
+    similar = similar_games.get(bg_id)
+    if similar == None or any(similar_id not in catalog for similar_id, score in similar):
+        return None
+    return [dict(catalog.hit(similar_id), _score=score) for similar_id, score in similar]
+
+def main():
+    import pandas as pd
+    from dotenv import load_dotenv
+    from elasticsearch import Elasticsearch
+
+    from catalog import GameCatalog
+
+    parser = argparse.ArgumentParser(description='precompute the similar games of every game')
+    parser.add_argument('--parquet', default='bgg_games_info_cleaned.parquet.gzip')
+    parser.add_argument('--output', default=SIMILAR_GAMES_PATH)
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=100)
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    es_client = Elasticsearch("https://localhost:9200", basic_auth=("elastic", os.environ.get('ELASTIC_KEY')), ca_certs="~/http_ca.crt")
+    catalog = GameCatalog(pd.read_parquet(args.parquet))
+    similar_games = build_similar_games(es_client, catalog, args.k, args.batch)
+    similar_games.save(args.output)
+    print('saved', len(similar_games.ids), 'games to', args.output)
+
+if __name__ == '__main__':
+    main()
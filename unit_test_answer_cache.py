@@ -0,0 +1,79 @@
+import unittest
+
+from answer_cache import SemanticAnswerCache
+from search_cache import LocalStore
+
+class testSemanticAnswerCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticAnswerCache(threshold=0.95, max_entries=2)
+
+    def test_hit_above_threshold(self):
+        self.cache.store('uno', [1.0, 0.0], 'draw 7 cards')
+        self.assertEqual(self.cache.lookup('uno', [0.99, 0.05]), 'draw 7 cards')
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_miss_below_threshold(self):
+        self.cache.store('uno', [1.0, 0.0], 'draw 7 cards')
+        self.assertEqual(self.cache.lookup('uno', [0.5, 0.5]), None)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_per_rulebook(self):
+        self.cache.store('uno', [1.0, 0.0], 'draw 7 cards')
+        self.assertEqual(self.cache.lookup('splendor', [1.0, 0.0]), None)
+
+    def test_best_match(self):
+        self.cache.store('uno', [1.0, 0.0], 'first')
+        self.cache.store('uno', [0.0, 1.0], 'second')
+        self.assertEqual(self.cache.lookup('uno', [0.1, 1.0]), 'second')
+
+    def test_max_entries(self):
+        self.cache.store('uno', [1.0, 0.0, 0.0], 'first')
+        self.cache.store('uno', [0.0, 1.0, 0.0], 'second')
+        self.cache.store('uno', [0.0, 0.0, 1.0], 'third')
+        self.assertEqual(self.cache.lookup('uno', [1.0, 0.0, 0.0]), None)
+        self.assertEqual(self.cache.stats()['answers'], 2)
+
+    def test_invalidate(self):
+        self.cache.store('uno', [1.0, 0.0], 'draw 7 cards')
+        self.cache.store('splendor', [1.0, 0.0], 'take 3 gems')
+        self.cache.invalidate('uno')
+        self.assertEqual(self.cache.lookup('uno', [1.0, 0.0]), None)
+        self.assertEqual(self.cache.lookup('splendor', [1.0, 0.0]), 'take 3 gems')
+        self.cache.invalidate()
+        self.assertEqual(self.cache.lookup('splendor', [1.0, 0.0]), None)
+
+    def test_ttl(self):
+        cache = SemanticAnswerCache(threshold=0.95, ttl=0)
+        cache.store('uno', [1.0, 0.0], 'draw 7 cards')
+        self.assertEqual(cache.lookup('uno', [1.0, 0.0]), None)
+
+    # a rulebook invalidated in one worker is dropped by the others
+    def test_shared_invalidate(self):
+        store = LocalStore()
+        first = SemanticAnswerCache(store=store, generation_check=0)
+        second = SemanticAnswerCache(store=store, generation_check=0)
+        second.store('uno', [1.0, 0.0], 'draw 7 cards')
+        second.store('splendor', [1.0, 0.0], 'take 3 gems')
+        first.invalidate('uno')
+        self.assertEqual(second.lookup('uno', [1.0, 0.0]), None)
+        self.assertEqual(second.lookup('splendor', [1.0, 0.0]), 'take 3 gems')
+        first.invalidate()
+        self.assertEqual(second.lookup('splendor', [1.0, 0.0]), None)
+
+    # answers stored after the invalidate are served again
+    def test_store_after_invalidate(self):
+        store = LocalStore()
+        first = SemanticAnswerCache(store=store, generation_check=0)
+        second = SemanticAnswerCache(store=store, generation_check=0)
+        first.invalidate('uno')
+        second.store('uno', [1.0, 0.0], 'draw 7 cards')
+        self.assertEqual(second.lookup('uno', [1.0, 0.0]), 'draw 7 cards')
+
+    def test_zero_and_mismatched_vectors(self):
+        self.cache.store('uno', [0.0, 0.0], 'ignored')
+        self.assertEqual(self.cache.stats()['answers'], 0)
+        self.cache.store('uno', [1.0, 0.0], 'draw 7 cards')
+        self.assertEqual(self.cache.lookup('uno', [1.0, 0.0, 0.0]), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import csv
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bgg_fetcher import BggFetcher, FetchCheckpoint, RateLimiter, export_csv, fingerprint, parse_games
+
+GAME_XML = '<boardgame objectid="{id}"><yearpublished>2018</yearpublished><minplayers>2</minplayers>' \
+    '<name primary="true">game {id}</name><name>other {id}</name><description>about {id}</description></boardgame>'
+
+# stub of the BGG XML API, /xmlapi/boardgame/1,2,3 answers every id below 100
+class stubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            fail = server.fail > 0
+            if fail:
+                server.fail -= 1
+        if fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+        bg_ids = [int(bg_id) for bg_id in self.path.rsplit('/', 1)[1].split(',')]
+        body = '<boardgames>' + ''.join(GAME_XML.format(id=bg_id) for bg_id in bg_ids if bg_id < 100) + '</boardgames>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+def make_ranks(count):
+    return [{'id': str(bg_id), 'name': 'game ' + str(bg_id), 'yearpublished': '2018', 'bayesaverage': '7.5'} for bg_id in range(1, count + 1)]
+
+class testBggFetcher(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), stubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.fail = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:' + str(self.server.server_address[1]) + '/xmlapi/boardgame/'
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = FetchCheckpoint(os.path.join(self.directory.name, 'checkpoint.sqlite3'))
+
+    def tearDown(self):
+        self.checkpoint.close()
+        self.directory.cleanup()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_fetcher(self, **kwargs):
+        options = {'url': self.url, 'batch_size': 10, 'workers': 3, 'rate': 1000, 'backoff': 0.01}
+        options.update(kwargs)
+        return BggFetcher(self.checkpoint, **options)
+
+    def test_parse(self):
+        games = parse_games(('<boardgames>' + GAME_XML.format(id=7) + '</boardgames>').encode('utf-8'))
+        self.assertEqual(games[7]['name'], 'game 7')
+        self.assertEqual(games[7]['year_published'], '2018')
+        self.assertEqual(games[7]['image'], '')
+
+    def test_batches(self):
+        stats = self.make_fetcher().run(make_ranks(45))
+        self.assertEqual(stats, {'requested': 45, 'fetched': 45, 'missing': 0, 'failed_batches': 0})
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(len(self.checkpoint.games()), 45)
+
+    # a second run requests nothing, changed and new games only are fetched again
+    def test_incremental(self):
+        ranks = make_ranks(30)
+        self.make_fetcher().run(ranks)
+        self.server.requests = []
+        self.assertEqual(self.make_fetcher().run(ranks)['requested'], 0)
+        self.assertEqual(self.server.requests, [])
+
+        ranks[4]['name'] = 'renamed'
+        ranks[4]['bayesaverage'] = '8.0'
+        ranks[7]['bayesaverage'] = '8.0'
+        ranks.append({'id': '31', 'name': 'new', 'yearpublished': '2024', 'bayesaverage': '6.0'})
+        self.make_fetcher().run(ranks)
+        self.assertEqual(self.server.requests, ['/xmlapi/boardgame/5,31'])
+
+    def test_max_age(self):
+        ranks = make_ranks(5)
+        self.make_fetcher().run(ranks)
+        time.sleep(0.05)
+        self.assertEqual(self.make_fetcher().run(ranks, max_age=0.01)['requested'], 5)
+
+    # ids the API does not know are retried max_misses times, then left alone
+    def test_missing(self):
+        ranks = make_ranks(2) + [{'id': '150', 'name': 'gone', 'yearpublished': '2000', 'bayesaverage': '5.0'}]
+        self.assertEqual(self.make_fetcher(max_misses=2).run(ranks)['missing'], 1)
+        self.server.requests = []
+        self.assertEqual(self.make_fetcher(max_misses=2).run(ranks)['requested'], 1)
+        self.assertEqual(self.server.requests, ['/xmlapi/boardgame/150'])
+        self.assertEqual(self.make_fetcher(max_misses=2).run(ranks)['requested'], 0)
+
+    # a game a partial answer left out is fetched on the next run
+    def test_missing_retried(self):
+        ranks = make_ranks(10)
+        self.checkpoint.save([(int(row['id']), fingerprint(row), None if row['id'] == '7' else {'name': row['name']}) for row in ranks])
+        self.assertEqual(self.make_fetcher().run(ranks)['requested'], 1)
+        self.assertEqual(self.server.requests, ['/xmlapi/boardgame/7'])
+        self.assertEqual(len(self.checkpoint.games()), 10)
+
+    # empty games of a checkpoint from before the miss counter are retried
+    def test_old_checkpoint(self):
+        path = os.path.join(self.directory.name, 'old.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE game (id INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL, fetched_at REAL NOT NULL, data TEXT)')
+        connection.execute("INSERT INTO game VALUES (1, 'a', 1.0, NULL), (2, 'b', 1.0, '{}')")
+        connection.commit()
+        connection.close()
+        checkpoint = FetchCheckpoint(path)
+        self.assertEqual(checkpoint.fetched(), {1: ('a', 1.0, 1), 2: ('b', 1.0, 0)})
+        checkpoint.close()
+
+    # an id missing from a later answer keeps the data fetched before
+    def test_missing_keeps_data(self):
+        self.checkpoint.save([(7, 'old', {'name': 'game 7'})], now=1.0)
+        self.checkpoint.save([(7, 'new', None), (8, 'new', None)], now=2.0)
+        self.assertEqual(self.checkpoint.games(), {7: {'name': 'game 7'}})
+        self.assertEqual(self.checkpoint.fetched(), {7: ('new', 2.0, 0), 8: ('new', 2.0, 1)})
+        self.checkpoint.save([(8, 'new', None)], now=3.0)
+        self.assertEqual(self.checkpoint.fetched()[8], ('new', 3.0, 2))
+        self.checkpoint.save([(7, 'newer', {'name': 'renamed'})], now=3.0)
+        self.assertEqual(self.checkpoint.games(), {7: {'name': 'renamed'}})
+
+    def test_retry(self):
+        self.server.fail = 2
+        stats = self.make_fetcher(workers=1).run(make_ranks(10))
+        self.assertEqual(stats['fetched'], 10)
+        self.assertEqual(len(self.server.requests), 3)
+
+    # a batch failing every retry is left for the next run
+    def test_resume(self):
+        self.server.fail = 3
+        stats = self.make_fetcher(workers=1, retries=2).run(make_ranks(20))
+        self.assertEqual(stats['failed_batches'], 1)
+        self.assertEqual(stats['fetched'], 10)
+        stats = self.make_fetcher().run(make_ranks(20))
+        self.assertEqual(stats['requested'], 10)
+        self.assertEqual(len(self.checkpoint.games()), 20)
+
+    def test_rate_limit(self):
+        limiter = RateLimiter(100)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_export(self):
+        ranks = make_ranks(3)
+        self.make_fetcher().run(ranks)
+        path = os.path.join(self.directory.name, 'games.csv')
+        self.assertEqual(export_csv(self.checkpoint, ranks, path), 3)
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row['name'] for row in rows], ['game 1', 'game 2', 'game 3'])
+        self.assertEqual(rows[0]['bayes_average'], '7.5')
+
+if __name__ == '__main__':
+    unittest.main()
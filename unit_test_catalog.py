@@ -0,0 +1,75 @@
+import json
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from catalog import GameCatalog
+from game_lookup import get_games_by_ids, like_documents
+from unit_test_game_lookup import fakeEsClient
+
+df = pd.DataFrame({
+    'id': [224517, 161936, 174430],
+    'name': ['Brass: Birmingham', 'Pandemic Legacy: Season 1', 'Gloomhaven'],
+    'description': ['brass', 'pandemic', 'gloomhaven'],
+    'boardgame_subdomain': ['Strategy Games', 'Strategy Games', np.nan],
+    'min_players': [2, 2, 1],
+    'bayes_average': [8.4, 8.3, np.nan],
+})
+
+class testGameCatalog(unittest.TestCase):
+    def setUp(self):
+        self.catalog = GameCatalog(df)
+
+    def test_get(self):
+        self.assertEqual(self.catalog.get(161936), {
+            'id': 161936,
+            'name': 'Pandemic Legacy: Season 1',
+            'description': 'pandemic',
+            'boardgame_subdomain': 'Strategy Games',
+            'min_players': 2,
+            'bayes_average': 8.3
+        })
+
+    def test_get_fields(self):
+        self.assertEqual(self.catalog.get('224517', ['id', 'name']), {'id': 224517, 'name': 'Brass: Birmingham'})
+
+    def test_get_missing(self):
+        self.assertEqual(self.catalog.get(1), None)
+        self.assertEqual(self.catalog.get('test'), None)
+        self.assertFalse(1 in self.catalog)
+        self.assertTrue('174430' in self.catalog)
+
+    def test_get_json_serializable(self):
+        game = self.catalog.get(174430)
+        self.assertEqual(game['boardgame_subdomain'], None)
+        self.assertEqual(game['bayes_average'], None)
+        self.assertEqual(type(game['min_players']), int)
+        json.dumps(game)
+
+    def test_get_returns_new_dict(self):
+        self.catalog.get(174430)['recommendation'] = []
+        self.assertFalse('recommendation' in self.catalog.get(174430))
+
+    def test_lookup_uses_catalog_first(self):
+        es_client = fakeEsClient({5: {'id': 5, 'name': 'Indexed later'}})
+        games = get_games_by_ids(es_client, [224517, 5], source=['name'], catalog=self.catalog)
+        self.assertEqual(len(es_client.calls), 1)
+        self.assertEqual(es_client.calls[0]['query']['constant_score']['filter']['terms']['id'], [5])
+        self.assertEqual(games[224517], {'_index': 'bgg', '_id': '224517', '_source': {'name': 'Brass: Birmingham', 'id': 224517}})
+        self.assertEqual(like_documents([games[224517], games[5]], self.catalog), [
+            {'_index': 'bgg', 'doc': {'name': 'Brass: Birmingham', 'description': 'brass', 'boardgame_subdomain': 'Strategy Games'}},
+            {'_id': 'es_5'}
+        ])
+
+    def test_hit(self):
+        self.assertEqual(self.catalog.hit('224517', ['name']), {'_index': 'bgg', '_id': '224517', '_source': {'name': 'Brass: Birmingham'}})
+        self.assertEqual(self.catalog.hit(1), None)
+
+    def test_lookup_all_in_catalog(self):
+        es_client = fakeEsClient({})
+        get_games_by_ids(es_client, [224517, 161936], catalog=self.catalog)
+        self.assertEqual(len(es_client.calls), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import unittest
+
+from langchain.chains import ConversationalRetrievalChain
+from langchain.memory import ConversationBufferWindowMemory
+from langchain_core.documents import Document
+from langchain_core.language_models.fake import FakeStreamingListLLM
+from langchain_core.retrievers import BaseRetriever
+
+from chat_stream import stream_answer, sse_event
+
+class fakeRetriever(BaseRetriever):
+    queries: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        self.queries.append(query)
+        return [Document(page_content='Each player is dealt 7 cards.')]
+
+def build_qa(llm, retriever, history=[]):
+    memory = ConversationBufferWindowMemory(memory_key="chat_history", return_messages=True, k=3)
+    for human, ai in history:
+        memory.save_context({'input': human}, {'output': ai})
+    return ConversationalRetrievalChain.from_llm(llm, retriever=retriever, memory=memory)
+
+class testChatStream(unittest.TestCase):
+    def test_stream_first_message(self):
+        llm = FakeStreamingListLLM(responses=['7 cards'])
+        retriever = fakeRetriever(queries=[])
+        qa = build_qa(llm, retriever)
+        self.assertEqual(''.join(stream_answer(qa, llm, 'how many cards do I draw in uno')), '7 cards')
+        self.assertEqual(retriever.queries, ['how many cards do I draw in uno'])
+
+    def test_stream_condenses_with_history(self):
+        llm = FakeStreamingListLLM(responses=['how many cards in uno', '7 cards'])
+        retriever = fakeRetriever(queries=[])
+        qa = build_qa(llm, retriever, [('what is uno', 'a card game')])
+        tokens = list(stream_answer(qa, llm, 'how many cards'))
+        self.assertTrue(len(tokens) > 1)
+        self.assertEqual(''.join(tokens), '7 cards')
+        self.assertEqual(retriever.queries, ['how many cards in uno'])
+
+    def test_sse_event(self):
+        event = sse_event('token', {'token': 'a\nb'})
+        self.assertEqual(event, 'event: token\ndata: {"token": "a\\nb"}\n\n')
+        self.assertEqual(json.loads(event.split('data: ')[1]), {'token': 'a\nb'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+from datetime import datetime
+
+from cursor_codec import encode_token, decode_token
+
+class testCursorCodec(unittest.TestCase):
+    def test_round_trip(self):
+        token = encode_token({'pit': 'pit==', 'after': [12.5, 42]})
+        self.assertEqual(decode_token(token), {'pit': 'pit==', 'after': [12.5, 42]})
+        self.assertNotIn('+', token + encode_token(['>>>???']))
+
+    # values json does not know are written as strings
+    def test_default_str(self):
+        self.assertEqual(decode_token(encode_token([datetime(2024, 1, 2)])), ['2024-01-02 00:00:00'])
+
+    def test_empty(self):
+        self.assertEqual(decode_token(''), None)
+        self.assertEqual(decode_token(None), None)
+
+    def test_invalid(self):
+        for token in ['test', encode_token([1])[:-2] + '!!', 'ä']:
+            with self.assertRaises(ValueError):
+                decode_token(token)
+
+if __name__ == '__main__':
+    unittest.main()
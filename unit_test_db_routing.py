@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import exc
+
+from db_routing import REPLICA_BIND, RoutingSession, TimedQueuePool, engine_options, pool_stats, read_only
+
+# an instance of its own, the replica bind must not leak into models.db
+# and the create_all of the other test files
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+class Rulebook(db.Model):
+    __tablename__ = "rulebook"
+    id = db.Column(db.Integer, primary_key = True)
+    name = db.Column(db.String(50), nullable=False)
+
+def make_app(directory, replica=True, **options):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, 'primary.db')
+    environ = {'DB_POOL_SIZE': '2', 'DB_MAX_OVERFLOW': '0', 'DB_REPLICA_POOL_SIZE': '3'}
+    if replica:
+        replica_options = engine_options(environ, 'DB_REPLICA_')
+        replica_options['url'] = 'sqlite:///' + os.path.join(directory, 'replica.db')
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: replica_options}
+    primary_options = engine_options(environ)
+    primary_options.update(options)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = primary_options
+    db.init_app(app)
+    return app
+
+# the replica is a second sqlite database with the same tables
+def create_database(engine, name):
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Rulebook.__table__.insert().values(name = name))
+
+@read_only
+def read_rulebooks():
+    return [r.name for r in Rulebook.query.all()]
+
+def read_rulebooks_primary():
+    return [r.name for r in Rulebook.query.all()]
+
+class testDbRouting(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read_only_uses_replica(self):
+        app = make_app(self.directory.name)
+        with app.app_context():
+            create_database(db.engines[None], 'primary')
+            create_database(db.engines[REPLICA_BIND], 'replica')
+            self.assertEqual(read_rulebooks(), ['replica'])
+            db.session.remove()
+            self.assertEqual(read_rulebooks_primary(), ['primary'])
+            db.engines[None].dispose()
+            db.engines[REPLICA_BIND].dispose()
+
+    # writes of a read-only view still go to the primary
+    @read_only
+    def write_rulebook(self):
+        db.session.add(Rulebook(name = 'new'))
+        db.session.commit()
+
+    def test_read_only_writes_primary(self):
+        app = make_app(self.directory.name)
+        with app.app_context():
+            create_database(db.engines[None], 'primary')
+            create_database(db.engines[REPLICA_BIND], 'replica')
+            self.write_rulebook()
+            db.session.remove()
+            self.assertEqual(read_rulebooks_primary(), ['primary', 'new'])
+            self.assertEqual(read_rulebooks(), ['replica'])
+            db.engines[None].dispose()
+            db.engines[REPLICA_BIND].dispose()
+
+    def test_without_replica(self):
+        app = make_app(self.directory.name, replica=False)
+        with app.app_context():
+            create_database(db.engines[None], 'primary')
+            self.assertEqual(read_rulebooks(), ['primary'])
+            db.engines[None].dispose()
+
+    def test_pool_stats(self):
+        app = make_app(self.directory.name, pool_timeout=0.05)
+        with app.app_context():
+            create_database(db.engines[None], 'primary')
+            self.assertIsInstance(db.engines[None].pool, TimedQueuePool)
+            first = db.engines[None].connect()
+            second = db.engines[None].connect()
+            self.assertEqual(pool_stats(db.engines)['default']['utilisation'], 1.0)
+            with self.assertRaises(exc.TimeoutError):
+                db.engines[None].connect()
+            first.close()
+            second.close()
+
+            stats = pool_stats(db.engines)
+            self.assertEqual(set(stats), {'default', REPLICA_BIND})
+            self.assertEqual(stats[REPLICA_BIND]['size'], 3)
+            self.assertEqual(stats['default']['checked_out'], 0)
+            self.assertEqual(stats['default']['checked_out_max'], 2)
+            self.assertEqual(stats['default']['timeouts'], 1)
+            self.assertGreaterEqual(stats['default']['checkouts'], 2)
+            db.engines[None].dispose()
+            db.engines[REPLICA_BIND].dispose()
+
+if __name__ == '__main__':
+    unittest.main()
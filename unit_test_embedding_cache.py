@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from embedding_cache import CachedEmbeddings, cache_key
+
+class fakeEmbeddings:
+    def __init__(self):
+        self.queries = []
+        self.documents = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 0.5]
+
+    def embed_documents(self, texts):
+        self.documents.append(texts)
+        return [[float(len(text)), 0.25] for text in texts]
+
+class testEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite3')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cache_key_normalized(self):
+        self.assertEqual(cache_key('nomic', 'How many cards  do I draw in UNO '), cache_key('nomic', 'how many cards do i draw in uno'))
+        self.assertNotEqual(cache_key('nomic', 'uno'), cache_key('other', 'uno'))
+
+    def test_query_memory_hit(self):
+        embeddings = fakeEmbeddings()
+        cached = CachedEmbeddings(embeddings, 'nomic')
+        self.assertEqual(cached.embed_query('how many cards'), [14.0, 0.5])
+        self.assertEqual(cached.embed_query('How many  cards'), [14.0, 0.5])
+        self.assertEqual(embeddings.queries, ['how many cards'])
+        self.assertEqual(cached.stats()['hits'], 1)
+        self.assertEqual(cached.stats()['hit_rate'], 0.5)
+
+    def test_query_disk_hit(self):
+        CachedEmbeddings(fakeEmbeddings(), 'nomic', path=self.path).embed_query('uno')
+        embeddings = fakeEmbeddings()
+        cached = CachedEmbeddings(embeddings, 'nomic', path=self.path)
+        self.assertEqual(cached.embed_query('uno'), [3.0, 0.5])
+        self.assertEqual(embeddings.queries, [])
+        self.assertEqual(cached.stats()['disk_hits'], 1)
+
+    def test_documents_only_missing(self):
+        embeddings = fakeEmbeddings()
+        cached = CachedEmbeddings(embeddings, 'nomic')
+        cached.embed_documents(['a', 'bb'])
+        self.assertEqual(cached.embed_documents(['bb', 'ccc', 'a']), [[2.0, 0.25], [3.0, 0.25], [1.0, 0.25]])
+        self.assertEqual(embeddings.documents, [['a', 'bb'], ['ccc']])
+
+    def test_lru_size(self):
+        cached = CachedEmbeddings(fakeEmbeddings(), 'nomic', max_size=2)
+        cached.embed_documents(['a', 'b', 'c'])
+        self.assertEqual(cached.stats()['size'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
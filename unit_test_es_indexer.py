@@ -0,0 +1,135 @@
+import unittest
+from datetime import datetime
+
+from es_indexer import build_actions, versioned_index_name, load_index, swap_alias, delete_old_indices, run_indexer
+
+class fakeIndices:
+    def __init__(self, indices, aliases):
+        self.indices = indices
+        self.aliases = aliases
+        self.calls = []
+
+    def create(self, index, settings):
+        self.calls.append(('create', index, settings))
+        self.indices.add(index)
+
+    def put_settings(self, index, settings):
+        self.calls.append(('put_settings', index, settings))
+
+    def refresh(self, index):
+        self.calls.append(('refresh', index))
+
+    def exists_alias(self, name):
+        return name in self.aliases
+
+    def exists(self, index):
+        return index in self.indices
+
+    def get_alias(self, name):
+        return {index: {} for index in self.aliases[name]}
+
+    def get(self, index):
+        prefix = index.rstrip('*')
+        return {name: {} for name in self.indices if name.startswith(prefix)}
+
+    def update_aliases(self, actions):
+        self.calls.append(('update_aliases', actions))
+
+    def delete(self, index):
+        self.calls.append(('delete', index))
+        self.indices.discard(index)
+
+class fakeEsClient:
+    def __init__(self, indices=(), aliases=None):
+        self.indices = fakeIndices(set(indices), aliases or {})
+
+# stands in for helpers.parallel_bulk, records the chunks it is handed
+def fake_bulk(failing=()):
+    calls = []
+    def bulk(client, actions, thread_count, chunk_size, raise_on_error):
+        calls.append({'thread_count': thread_count, 'chunk_size': chunk_size})
+        for action in actions:
+            yield action['_id'] not in failing, action
+    bulk.calls = calls
+    return bulk
+
+def make_batches(read):
+    for start in range(0, 6, 2):
+        read.append(start)
+        yield [{'id': str(i), 'name': 'game ' + str(i), 'rating': float('nan') if i == 3 else 7.5} for i in range(start, start + 2)]
+
+class testEsIndexer(unittest.TestCase):
+    def test_actions(self):
+        actions = list(build_actions('bgg-1', make_batches([])))
+        self.assertEqual(len(actions), 6)
+        self.assertEqual(actions[3], {'_index': 'bgg-1', '_id': '3', '_source': {'id': '3', 'name': 'game 3', 'rating': None}})
+
+    # batches are read while the bulk requests run, not all up front
+    def test_actions_stream(self):
+        read = []
+        actions = build_actions('bgg-1', make_batches(read))
+        next(actions)
+        self.assertEqual(read, [0])
+
+    def test_index_name(self):
+        self.assertEqual(versioned_index_name('bgg', datetime(2024, 1, 2, 3, 4, 5)), 'bgg-20240102030405')
+
+    def test_load_index(self):
+        es_client = fakeEsClient()
+        bulk = fake_bulk(failing=['4'])
+        self.assertEqual(load_index(es_client, 'bgg-1', make_batches([]), chunk_size=100, workers=3, bulk=bulk), (5, 1))
+        self.assertEqual(bulk.calls, [{'thread_count': 3, 'chunk_size': 100}])
+        self.assertEqual(es_client.indices.calls[0], ('create', 'bgg-1', {'number_of_replicas': 0, 'refresh_interval': '-1'}))
+        self.assertEqual(es_client.indices.calls[-1], ('refresh', 'bgg-1'))
+
+    # a batch that cannot be read leaves no half loaded index behind
+    def test_load_index_error(self):
+        def broken_batches():
+            yield [{'id': '1', 'name': 'game 1'}]
+            raise IOError('parquet file is truncated')
+        es_client = fakeEsClient(['bgg-1'])
+        with self.assertRaises(IOError):
+            load_index(es_client, 'bgg-2', broken_batches(), bulk=fake_bulk())
+        self.assertEqual(es_client.indices.calls[-1], ('delete', 'bgg-2'))
+        self.assertEqual(es_client.indices.indices, {'bgg-1'})
+
+    def test_swap_alias(self):
+        es_client = fakeEsClient(['bgg-1', 'bgg-2'], {'bgg': ['bgg-1']})
+        self.assertEqual(swap_alias(es_client, 'bgg', 'bgg-2'), ['bgg-1'])
+        self.assertEqual(es_client.indices.calls, [('update_aliases', [
+            {'remove': {'index': 'bgg-1', 'alias': 'bgg'}},
+            {'add': {'index': 'bgg-2', 'alias': 'bgg'}}
+        ])])
+
+    # the first run replaces the plain bgg index of the notebook
+    def test_swap_plain_index(self):
+        es_client = fakeEsClient(['bgg', 'bgg-2'])
+        self.assertEqual(swap_alias(es_client, 'bgg', 'bgg-2'), [])
+        self.assertEqual(es_client.indices.calls, [('update_aliases', [
+            {'remove_index': {'index': 'bgg'}},
+            {'add': {'index': 'bgg-2', 'alias': 'bgg'}}
+        ])])
+
+    def test_delete_old_indices(self):
+        es_client = fakeEsClient(['bgg-1', 'bgg-2', 'bgg-3', 'bgg-4'])
+        self.assertEqual(delete_old_indices(es_client, 'bgg', 'bgg-4', keep=1), ['bgg-2', 'bgg-1'])
+        self.assertEqual(es_client.indices.indices, {'bgg-3', 'bgg-4'})
+
+    # a failed document leaves the alias on the old index
+    def test_run_indexer_failure(self):
+        es_client = fakeEsClient(['bgg-1'], {'bgg': ['bgg-1']})
+        with self.assertRaises(RuntimeError):
+            run_indexer(es_client, make_batches([]), bulk=fake_bulk(failing=['0']))
+        self.assertFalse(any(call[0] == 'update_aliases' for call in es_client.indices.calls))
+        self.assertEqual(es_client.indices.indices, {'bgg-1'})
+
+    def test_run_indexer(self):
+        es_client = fakeEsClient(['bgg-1'], {'bgg': ['bgg-1']})
+        result = run_indexer(es_client, make_batches([]), keep=0, bulk=fake_bulk())
+        self.assertEqual(result['indexed'], 6)
+        self.assertEqual(result['previous'], ['bgg-1'])
+        self.assertEqual(result['deleted'], ['bgg-1'])
+        self.assertEqual(es_client.indices.indices, {result['index']})
+
+if __name__ == '__main__':
+    unittest.main()
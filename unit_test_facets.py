@@ -0,0 +1,49 @@
+import unittest
+
+import pandas as pd
+
+from facets import build_facets, build_facet_aggs, read_facet_aggs
+
+df = pd.DataFrame({
+    'boardgame_subdomain': ['Strategy Games', 'Family Games', 'Strategy Games'],
+    'boardgame_designer': ['Gavan Brown', 'Matt Leacock', 'Matt Leacock'],
+    'boardgame_publisher': ['Roxley', 'Z-Man Games', 'Z-Man Games'],
+    'min_players': [2, 1, 2],
+    'max_players': [4, 4, 8],
+})
+
+class testFacets(unittest.TestCase):
+    def test_build_facets_categories(self):
+        self.assertEqual(build_facets(df)['categories'], ['Strategy Games', 'Family Games'])
+
+    def test_build_facets_terms(self):
+        self.assertEqual(build_facets(df)['counts']['boardgame_designer'], [
+            {'value': 'Matt Leacock', 'count': 2},
+            {'value': 'Gavan Brown', 'count': 1}
+        ])
+
+    def test_build_facets_player_ranges(self):
+        self.assertEqual(build_facets(df)['counts']['max_players'], [
+            {'value': '1', 'count': 0},
+            {'value': '2', 'count': 0},
+            {'value': '3-4', 'count': 2},
+            {'value': '5-6', 'count': 0},
+            {'value': '7+', 'count': 1}
+        ])
+
+    def test_build_facet_aggs(self):
+        aggs = build_facet_aggs()
+        self.assertEqual(aggs['boardgame_publisher'], {'terms': {'field': 'boardgame_publisher.keyword', 'size': 20}})
+        self.assertEqual(aggs['min_players']['range']['ranges'][-1], {'key': '7+', 'from': 7})
+
+    def test_read_facet_aggs(self):
+        counts = read_facet_aggs({
+            'boardgame_designer': {'buckets': [{'key': 'Matt Leacock', 'doc_count': 2}]},
+            'max_players': {'buckets': [{'key': '3-4', 'from': 3.0, 'to': 5.0, 'doc_count': 2}]}
+        })
+        self.assertEqual(counts['boardgame_designer'], [{'value': 'Matt Leacock', 'count': 2}])
+        self.assertEqual(counts['max_players'], [{'value': '3-4', 'count': 2}])
+        self.assertEqual(counts['boardgame_publisher'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
+import random
 import unittest
 
+import numpy as np
+
 from build_filter import build_filter_min_age, build_filter_min_players, build_filter_max_players, build_filter_min_playtime
 from build_filter import build_filter_max_playtime, build_filter_min_year, build_filter_max_year, build_filter_match
+from pick_filter import pick_filter_mask
 
 class testBuildFilter(unittest.TestCase):
     # min_age
@@ -522,5 +526,65 @@ class testPickFilter(unittest.TestCase):
             }
         ])
 
+def pick_filter_all(return_list, min_age, min_playtime, max_playtime, min_players, max_players):
+    return_list = pick_filter_min_age(return_list, min_age)
+    return_list = pick_filter_min_playtime(return_list, min_playtime)
+    return_list = pick_filter_max_playtime(return_list, max_playtime)
+    return_list = pick_filter_min_players(return_list, min_players)
+    return_list = pick_filter_max_players(return_list, max_players)
+    return return_list
+
+def to_columns(return_list):
+    return {key: np.array([item[key] for item in return_list]) for key in ['min_age', 'min_playtime', 'max_playtime', 'min_players', 'max_players']}
+
+def random_pick_list(size, seed):
+    generator = random.Random(seed)
+    return [
+        {
+            'min_age': generator.randint(0, 21),
+            'min_playtime': generator.choice([15, 30, 45, 60, 90, 120]),
+            'max_playtime': generator.choice([30, 60, 90, 120, 180, 240]),
+            'min_players': generator.randint(1, 4),
+            'max_players': generator.randint(1, 10)
+        }
+        for i in range(size)
+    ]
+
+# same arguments as the testPickFilter cases, plus every filter at once
+mask_cases = [
+    (0, 0, 0, 0, 0),
+    ('14', '30', '140', '3', '6'),
+    (16, None, None, None, None),
+    (None, 60, None, None, None),
+    (None, None, 140, None, None),
+    (None, None, None, 3, None),
+    (None, None, None, None, 6),
+    (18, 30, 180, 2, 4),
+    (True, 30.0, None, 2, 0),
+]
+
+class testPickFilterMask(unittest.TestCase):
+    def test_mask_matches_pick_filter(self):
+        columns = to_columns(pick_list)
+        for case in mask_cases:
+            mask = pick_filter_mask(columns, *case)
+            self.assertEqual([item for item, keep in zip(pick_list, mask) if keep], pick_filter_all(pick_list, *case), case)
+
+    def test_mask_matches_pick_filter_random(self):
+        return_list = random_pick_list(2000, 499)
+        columns = to_columns(return_list)
+        for case in mask_cases:
+            mask = pick_filter_mask(columns, *case)
+            self.assertEqual([item for item, keep in zip(return_list, mask) if keep], pick_filter_all(return_list, *case), case)
+
+    def test_mask_empty(self):
+        self.assertEqual(len(pick_filter_mask(to_columns([]), 18, 30, 180, 2, 4)), 0)
+
+    # the size benchmark_pick_filter.py times
+    def test_mask_large(self):
+        return_list = random_pick_list(100000, 100000)
+        mask = pick_filter_mask(to_columns(return_list), 18, 30, 180, 2, 4)
+        self.assertEqual(int(mask.sum()), len(pick_filter_all(return_list, 18, 30, 180, 2, 4)))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
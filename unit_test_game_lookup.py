@@ -0,0 +1,55 @@
+import unittest
+
+from game_lookup import get_games_by_ids, hydrate_games
+
+# stands in for the elasticsearch client, only knows the terms lookup
+class fakeEsClient:
+    def __init__(self, games):
+        self.games = games
+        self.calls = []
+
+    def search(self, index, query, size=10, source=None):
+        self.calls.append({'index': index, 'query': query, 'size': size, 'source': source})
+        ids = query['constant_score']['filter']['terms']['id']
+        return {'hits': {'hits': [
+            {'_id': 'es_' + str(bg_id), '_source': self.games[bg_id]} for bg_id in ids if bg_id in self.games
+        ][:size]}}
+
+games = {
+    224517: {'id': 224517, 'name': 'Brass: Birmingham', 'image': 'brass.jpg'},
+    161936: {'id': 161936, 'name': 'Pandemic Legacy: Season 1', 'image': 'pandemic.jpg'},
+    174430: {'id': 174430, 'name': 'Gloomhaven', 'image': 'gloomhaven.jpg'},
+}
+
+class testGameLookup(unittest.TestCase):
+    def test_get_games_single_search(self):
+        es_client = fakeEsClient(games)
+        result = get_games_by_ids(es_client, [224517, 161936, 174430])
+        self.assertEqual(len(es_client.calls), 1)
+        self.assertEqual(es_client.calls[0]['size'], 3)
+        self.assertEqual(sorted(result.keys()), [161936, 174430, 224517])
+
+    def test_get_games_empty(self):
+        es_client = fakeEsClient(games)
+        self.assertEqual(get_games_by_ids(es_client, []), {})
+        self.assertEqual(len(es_client.calls), 0)
+
+    def test_get_games_duplicate_and_string_ids(self):
+        es_client = fakeEsClient(games)
+        result = get_games_by_ids(es_client, ['224517', 224517, 'test'])
+        self.assertEqual(es_client.calls[0]['query']['constant_score']['filter']['terms']['id'], [224517])
+        self.assertEqual(list(result.keys()), [224517])
+
+    def test_get_games_source_keeps_id(self):
+        es_client = fakeEsClient(games)
+        get_games_by_ids(es_client, [224517], source=['image'])
+        self.assertEqual(es_client.calls[0]['source'], ['image', 'id'])
+
+    def test_hydrate_games_order_and_missing(self):
+        es_client = fakeEsClient(games)
+        result = hydrate_games(es_client, [174430, 1, 224517, 174430])
+        self.assertEqual(len(es_client.calls), 1)
+        self.assertEqual([hit['_id'] if hit else None for hit in result], ['es_174430', None, 'es_224517', 'es_174430'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from catalog import GameCatalog
+from game_vectors import build_game_vectors, load_game_vectors, vector_hits, GameVectors
+
+class fakeEmbeddings:
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self.vectors[text.split('\n')[0]] for text in texts]
+
+def make_catalog():
+    return GameCatalog(pd.DataFrame({
+        'id': ['1', '2', '3', '4', '5'],
+        'name': ['Catan', 'Carcassonne', 'Azul', 'Chess', 'Go'],
+        'image': ['a', 'b', 'c', 'd', 'e'],
+        'description': ['trade', 'tiles', 'tiles', 'abstract', 'abstract'],
+        'boardgame_subdomain': ['Family', 'Family', 'Family', 'Abstract', 'Abstract']
+    }))
+
+def make_vectors():
+    return {
+        'Catan': [1.0, 0.0],
+        'Carcassonne': [0.9, 0.1],
+        'Azul': [0.8, 0.2],
+        'Chess': [0.0, 1.0],
+        'Go': [0.1, 0.9]
+    }
+
+class testGameVectors(unittest.TestCase):
+    def test_build(self):
+        embeddings = fakeEmbeddings(make_vectors())
+        game_vectors = build_game_vectors(embeddings, make_catalog(), batch=2)
+        self.assertEqual(embeddings.calls, 3)
+        self.assertEqual(list(game_vectors.ids), [1, 2, 3, 4, 5])
+        np.testing.assert_allclose(np.linalg.norm(game_vectors.vectors, axis=1), 1.0, rtol=1e-6)
+
+    def test_recommend(self):
+        game_vectors = build_game_vectors(fakeEmbeddings(make_vectors()), make_catalog())
+        recommendations = game_vectors.recommend([1, 2], k=2)
+        # closest to the collection first, never the collection itself
+        self.assertEqual([bg_id for bg_id, score in recommendations], [3, 5])
+        self.assertEqual(game_vectors.recommend([6], k=2), None)
+
+    # one cluster per kind of game, the best of each comes first
+    def test_recommend_clusters(self):
+        game_vectors = build_game_vectors(fakeEmbeddings(make_vectors()), make_catalog())
+        recommendations = game_vectors.recommend([1, 2, 4], k=2, clusters=2)
+        self.assertEqual(sorted(bg_id for bg_id, score in recommendations), [3, 5])
+
+    def test_whole_catalog(self):
+        game_vectors = build_game_vectors(fakeEmbeddings(make_vectors()), make_catalog())
+        self.assertEqual(game_vectors.recommend([1, 2, 3, 4, 5], k=3), [])
+
+    def test_large_collection(self):
+        vectors = np.random.default_rng(0).normal(size=(5000, 8))
+        game_vectors = GameVectors(np.arange(5000), vectors)
+        recommendations = game_vectors.recommend(list(range(2000)), k=10, clusters=3)
+        self.assertEqual(len(recommendations), 10)
+        self.assertTrue(all(bg_id >= 2000 for bg_id, score in recommendations))
+
+    def test_hits_and_load(self):
+        catalog = make_catalog()
+        game_vectors = build_game_vectors(fakeEmbeddings(make_vectors()), catalog)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'game_vectors.npz')
+            self.assertEqual(load_game_vectors(path, catalog), None)
+            game_vectors.save(path)
+            loaded = load_game_vectors(path, catalog)
+            hits = vector_hits(loaded, catalog, [4], k=1)
+            self.assertEqual(hits[0]['_source']['name'], 'Go')
+            self.assertEqual(hits[0]['_id'], str(hits[0]['_source']['id']))
+            self.assertEqual(load_game_vectors(path, GameCatalog(pd.DataFrame({'id': ['1']}))), None)
+        self.assertEqual(vector_hits(None, catalog, [4]), None)
+
+if __name__ == '__main__':
+    unittest.main()
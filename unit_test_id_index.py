@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from catalog import GameCatalog
+from id_index import IdIndex, load_id_index
+
+class scoredIndex(IdIndex):
+    ARRAYS = ['ids', 'scores', 'flags']
+
+    def __init__(self, ids, scores, flags=None):
+        IdIndex.__init__(self, ids)
+        self.scores = scores
+        self.flags = flags
+
+class testIdIndex(unittest.TestCase):
+    def test_position(self):
+        index = IdIndex(np.array([3, 7], dtype=np.int64))
+        self.assertEqual(index.position('7'), 1)
+        self.assertEqual(index.position('test'), None)
+        self.assertTrue(3 in index)
+        self.assertFalse(4 in index)
+
+    # arrays missing from the file keep the constructor default
+    def test_save_load(self):
+        catalog = GameCatalog(pd.DataFrame({'id': ['3', '7']}))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.npz')
+            self.assertEqual(load_id_index(scoredIndex, path, catalog), None)
+            np.savez_compressed(path, ids=np.array([3, 7], dtype=np.int64), scores=np.array([0.5, 1.0]))
+            loaded = load_id_index(scoredIndex, path, catalog)
+            self.assertEqual(list(loaded.scores), [0.5, 1.0])
+            self.assertEqual(loaded.flags, None)
+            self.assertEqual(load_id_index(scoredIndex, path, GameCatalog(pd.DataFrame({'id': ['3']}))), None)
+
+if __name__ == '__main__':
+    unittest.main()
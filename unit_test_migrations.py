@@ -0,0 +1,139 @@
+import unittest
+
+from flask import Flask
+from sqlalchemy import event, inspect, text
+
+from models import db, User, Collection, CollectionItem, ChatHistory
+from migrations import migrate, current_version, MIGRATIONS
+from queries import get_collection_summaries, get_recent_messages, get_collections_with_game
+
+TABLES = ['user', 'collection', 'item', 'history', 'message', 'rulebook']
+LOOKUP_INDEXES = ['ix_item_collection_id_bg_id', 'ix_message_chat_id_date', 'ix_history_user_id_game', 'ix_collection_user_id']
+
+class testMigrations(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def index_names(self):
+        inspector = inspect(db.engine)
+        return set(index['name'] for table in TABLES for index in inspector.get_indexes(table))
+
+    def test_migrate_new_database(self):
+        self.assertEqual(migrate(db.engine), [number for number, name, upgrade in MIGRATIONS])
+        self.assertEqual(migrate(db.engine), [])
+        self.assertTrue(set(LOOKUP_INDEXES) <= self.index_names())
+
+    # a database created before the indexes only gets them added
+    def test_migrate_existing_database(self):
+        migrate(db.engine, target=1)
+        # version 1 is the frozen original schema, whatever models.py declares now
+        self.assertEqual(self.index_names() & set(LOOKUP_INDEXES), set())
+        with db.engine.begin() as connection:
+            self.assertEqual(current_version(connection), 1)
+        self.assertEqual(migrate(db.engine), [2])
+        self.assertTrue(set(LOOKUP_INDEXES) <= self.index_names())
+
+    # the last migration leaves the schema models.py declares
+    def test_migrations_match_models(self):
+        migrate(db.engine)
+        inspector = inspect(db.engine)
+        for table in db.metadata.tables.values():
+            self.assertEqual(
+                set(column['name'] for column in inspector.get_columns(table.name)),
+                set(column.name for column in table.columns)
+            )
+            self.assertTrue(set(index.name for index in table.indexes) <= set(index['name'] for index in inspector.get_indexes(table.name)))
+
+# the hot queries must be answered through an index, a full scan of a table
+# in the sqlite query plan fails the test
+class testQueryPlans(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        migrate(db.engine)
+
+        user = User(public_id = 'user', username = 'user', email = 'user@user', password = 'user', roles = 'ROLE_USER')
+        collection = Collection(name = 'first', public_id = 'first')
+        collection.boardgames = [CollectionItem(bg_id = bg_id, public_id = 'first_' + str(bg_id)) for bg_id in range(5)]
+        user.collections = [collection]
+        user.chats = [ChatHistory(public_id = 'chat', name = 'chat', game = 1)]
+        db.session.add(user)
+        db.session.commit()
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record_statement)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.record_statement)
+        db.session.remove()
+        db.drop_all()
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP TABLE schema_version'))
+        self.ctx.pop()
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    # every SELECT run so far, checked against its EXPLAIN QUERY PLAN
+    def assert_no_table_scan(self):
+        selects = [(statement, parameters) for statement, parameters in self.statements if statement.lstrip().startswith('SELECT')]
+        self.assertNotEqual(selects, [])
+        connection = db.session.connection().connection.dbapi_connection
+        for statement, parameters in selects:
+            plan = [row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters)]
+            for detail in plan:
+                for table in TABLES:
+                    if detail == 'SCAN ' + table or detail.startswith('SCAN ' + table + ' '):
+                        self.assertIn('INDEX', detail, statement + '\n' + '\n'.join(plan))
+
+    def test_collection_items(self):
+        CollectionItem.query\
+            .filter_by(collection_id = 'first')\
+            .all()
+        self.assert_no_table_scan()
+
+    def test_recent_messages(self):
+        get_recent_messages('chat', 10)
+        self.assert_no_table_scan()
+
+    def test_user_history(self):
+        ChatHistory.query\
+            .filter_by(user_id = 'user')\
+            .all()
+        ChatHistory.query\
+            .filter_by(user_id = 'user', game = 1)\
+            .all()
+        self.assert_no_table_scan()
+
+    def test_user_collections(self):
+        Collection.query\
+            .filter_by(user_id = 'user')\
+            .all()
+        get_collection_summaries('user')
+        get_collections_with_game('user', 1)
+        self.assert_no_table_scan()
+
+    # the check itself, without the index the same query scans the table
+    def test_detects_table_scan(self):
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP INDEX ix_collection_user_id'))
+        Collection.query\
+            .filter_by(user_id = 'user')\
+            .all()
+        with self.assertRaises(AssertionError):
+            self.assert_no_table_scan()
+
+if __name__ == '__main__':
+    unittest.main()
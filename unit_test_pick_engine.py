@@ -0,0 +1,84 @@
+import unittest
+
+import pandas as pd
+
+from catalog import GameCatalog
+from pick_engine import build_pick_filters, build_pick_query, pick_games, pick_from_catalog
+
+class fakeEsClient:
+    def __init__(self):
+        self.calls = []
+
+    def search(self, index, query, size=10, source=None):
+        self.calls.append({'query': query, 'size': size, 'source': source})
+        return {'hits': {'hits': [{'_id': 'a', '_source': {
+            'id': '224517', 'name': 'Brass: Birmingham', 'image': 'brass.jpg',
+            'min_playtime': 60, 'max_playtime': 120, 'min_players': 2, 'max_players': 4, 'age': 14
+        }}]}}
+
+class testPickEngine(unittest.TestCase):
+    def test_filters_default(self):
+        self.assertEqual(build_pick_filters(16, 60, 140, 3, 6), [
+            {'range': {'age': {'lte': 16}}},
+            {'range': {'min_playtime': {'gte': 60}}},
+            {'range': {'max_playtime': {'lte': 140}}},
+            {'range': {'min_players': {'lte': 3}}},
+            {'range': {'max_players': {'gte': 6}}}
+        ])
+
+    # same as pick_filter, zero, None and strings do not filter
+    def test_filters_ignored_values(self):
+        self.assertEqual(build_pick_filters(0, None, "140", 0, ""), [])
+
+    def test_query(self):
+        query = build_pick_query([1, 2], [{'range': {'age': {'lte': 16}}}])
+        self.assertEqual(query['function_score']['query']['bool']['filter'], [
+            {'terms': {'id': [1, 2]}},
+            {'range': {'age': {'lte': 16}}}
+        ])
+        self.assertEqual(query['function_score']['random_score'], {})
+
+    def test_pick_games(self):
+        es_client = fakeEsClient()
+        self.assertEqual(pick_games(es_client, [224517, 161936], 5), [{
+            'bg_id': 224517, 'name': 'Brass: Birmingham', 'image': 'brass.jpg',
+            'min_playtime': 60, 'max_playtime': 120, 'min_players': 2, 'max_players': 4, 'min_age': 14
+        }])
+        self.assertEqual(es_client.calls[0]['size'], 2)
+
+    def test_pick_games_empty(self):
+        es_client = fakeEsClient()
+        self.assertEqual(pick_games(es_client, [], 1), [])
+        self.assertEqual(es_client.calls, [])
+
+catalog = GameCatalog(pd.DataFrame({
+    'id': [1, 2, 3, 4],
+    'name': ['a', 'b', 'c', 'd'],
+    'image': ['a.jpg', 'b.jpg', 'c.jpg', 'd.jpg'],
+    'min_playtime': [30, 60, 90, 120],
+    'max_playtime': [60, 90, 120, 240],
+    'min_players': [1, 2, 2, 3],
+    'max_players': [4, 4, 6, 8],
+    'age': [8, 10, 14, 18],
+}))
+
+class testPickFromCatalog(unittest.TestCase):
+    def test_filters(self):
+        picks = pick_from_catalog(catalog, [1, 2, 3, 4], 10, min_age=14, min_playtime=60)
+        self.assertEqual(sorted(pick['bg_id'] for pick in picks), [2, 3])
+        self.assertEqual(type(picks[0]['min_age']), int)
+
+    def test_n_without_replacement(self):
+        for i in range(20):
+            picks = pick_from_catalog(catalog, [1, 2, 3, 4], 3)
+            self.assertEqual(len(set(pick['bg_id'] for pick in picks)), 3)
+
+    def test_no_match(self):
+        self.assertEqual(pick_from_catalog(catalog, [1, 2], 1, min_age=5), [])
+        self.assertEqual(pick_from_catalog(catalog, [], 1), [])
+
+    def test_missing_game(self):
+        self.assertEqual(pick_from_catalog(catalog, [1, 99], 1), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+from flask import Flask
+from sqlalchemy import event
+
+from models import db, User
+from principal_cache import PrincipalCache, Principal, to_principal, invalidate_on_change
+from search_cache import LocalStore
+
+class testPrincipalCache(unittest.TestCase):
+    def setUp(self):
+        self.loaded = []
+        self.cache = PrincipalCache(ttl=60)
+
+    def loader(self, public_id):
+        self.loaded.append(public_id)
+        if public_id == 'nobody':
+            return None
+        return Principal(1, public_id, 'user', 'user@user', 'ROLE_USER')
+
+    def test_hit(self):
+        self.cache.get('user', self.loader)
+        self.assertEqual(self.cache.get('user', self.loader).roles, 'ROLE_USER')
+        self.assertEqual(self.loaded, ['user'])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_unknown_user_not_cached(self):
+        self.assertEqual(self.cache.get('nobody', self.loader), None)
+        self.cache.get('nobody', self.loader)
+        self.assertEqual(self.loaded, ['nobody', 'nobody'])
+
+    def test_expired(self):
+        cache = PrincipalCache(ttl=0)
+        cache.get('user', self.loader)
+        cache.get('user', self.loader)
+        self.assertEqual(self.loaded, ['user', 'user'])
+
+    def test_invalidate(self):
+        self.cache.get('user', self.loader)
+        self.cache.invalidate('user')
+        self.cache.get('user', self.loader)
+        self.assertEqual(self.loaded, ['user', 'user'])
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+
+    # a user changed while its row was being loaded keeps no stale entry
+    def test_invalidate_during_load(self):
+        def loader(public_id):
+            principal = self.loader(public_id)
+            self.cache.invalidate(public_id)
+            return principal
+        self.cache.get('user', loader)
+        self.cache.get('user', self.loader)
+        self.assertEqual(self.loaded, ['user', 'user'])
+
+    # a user changed through another worker is not served from this one
+    def test_shared_invalidate(self):
+        store = LocalStore()
+        first = PrincipalCache(ttl=60, store=store, generation_check=0)
+        second = PrincipalCache(ttl=60, store=store, generation_check=0)
+        second.get('user', self.loader)
+        first.invalidate('user')
+        second.get('user', self.loader)
+        self.assertEqual(self.loaded, ['user', 'user'])
+
+class testPrincipalInvalidation(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.cache = PrincipalCache(ttl=60)
+        self.listener = invalidate_on_change(self.cache, User)
+        db.session.add(User(public_id = 'user', username = 'user', email = 'user@user', password = 'user', roles = 'ROLE_USER'))
+        db.session.commit()
+
+    def tearDown(self):
+        event.remove(User, 'after_update', self.listener)
+        event.remove(User, 'after_delete', self.listener)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def load(self, public_id):
+        user = User.query.filter_by(public_id = public_id).first()
+        return to_principal(user) if user else None
+
+    def test_role_change(self):
+        self.assertEqual(self.cache.get('user', self.load).roles, 'ROLE_USER')
+        User.query.filter_by(public_id = 'user').first().roles = 'ROLE_ADMIN'
+        db.session.commit()
+        self.assertEqual(self.cache.get('user', self.load).roles, 'ROLE_ADMIN')
+
+    def test_delete(self):
+        self.cache.get('user', self.load)
+        db.session.delete(User.query.filter_by(public_id = 'user').first())
+        db.session.commit()
+        self.assertEqual(self.cache.get('user', self.load), None)
+
+if __name__ == '__main__':
+    unittest.main()
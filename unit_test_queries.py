@@ -0,0 +1,180 @@
+import unittest
+
+from flask import Flask
+from sqlalchemy import event
+
+from datetime import datetime, timedelta
+
+from models import db, User, Collection, CollectionItem, ChatHistory, ChatMessage
+from queries import get_collection_summaries, get_recent_messages, get_collections_with_game
+from queries import add_collection_items, remove_collection_items
+from queries import get_message_page, get_history_page, message_cursor, decode_message_cursor, history_cursor, decode_history_cursor
+
+# runs the queries against an in-memory sqlite database
+class testQueries(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        user = User(public_id = 'user', username = 'user', email = 'user@user', password = 'user', roles = 'ROLE_USER')
+        other = User(public_id = 'other', username = 'other', email = 'other@other', password = 'other', roles = 'ROLE_USER')
+        first = Collection(name = 'first', public_id = 'first')
+        second = Collection(name = 'second', public_id = 'second')
+        empty = Collection(name = 'empty', public_id = 'empty')
+        foreign = Collection(name = 'foreign', public_id = 'foreign')
+        user.collections = [first, second, empty]
+        other.collections = [foreign]
+        first.boardgames = [CollectionItem(bg_id = bg_id, public_id = 'first_' + str(bg_id)) for bg_id in [5, 1, 4, 2, 3]]
+        second.boardgames = [CollectionItem(bg_id = 9, public_id = 'second_9')]
+        foreign.boardgames = [CollectionItem(bg_id = 7, public_id = 'foreign_7')]
+        chat = ChatHistory(public_id = 'chat', name = 'chat', game = 1)
+        user.chats = [chat]
+        start = datetime(2024, 1, 1)
+        chat.chats = [ChatMessage(
+            public_id = 'message_' + str(i),
+            is_human = i % 2 == 0,
+            date = start + timedelta(minutes = i),
+            message = str(i)
+        ) for i in range(50)]
+        db.session.add_all([user, other])
+        db.session.commit()
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.count_statement)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.count_statement)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def count_statement(self, *args):
+        self.statements.append(args[2])
+
+    def test_collection_summaries(self):
+        self.assertEqual(get_collection_summaries('user'), [
+            {'name': 'first', 'public_id': 'first', 'game_count': 5, 'bg_ids': [1, 2, 3]},
+            {'name': 'second', 'public_id': 'second', 'game_count': 1, 'bg_ids': [9]},
+            {'name': 'empty', 'public_id': 'empty', 'game_count': 0, 'bg_ids': []},
+        ])
+        self.assertEqual(len(self.statements), 1)
+
+    def test_collection_summaries_unknown_user(self):
+        self.assertEqual(get_collection_summaries('nobody'), [])
+
+    def test_collections_with_game(self):
+        self.assertEqual(get_collections_with_game('user', '9'), [
+            {'name': 'first', 'public_id': 'first', 'have': False},
+            {'name': 'second', 'public_id': 'second', 'have': True},
+            {'name': 'empty', 'public_id': 'empty', 'have': False},
+        ])
+        self.assertEqual([c['have'] for c in get_collections_with_game('user', 7)], [False, False, False])
+        self.assertEqual([c['have'] for c in get_collections_with_game('user', 'test')], [False, False, False])
+
+    # the have flag must not come back as one query per collection
+    def test_collections_with_game_query_count(self):
+        for c in range(20):
+            db.session.add(Collection(name = 'extra ' + str(c), public_id = 'extra_' + str(c), user_id = 'user'))
+        db.session.commit()
+        self.statements = []
+        self.assertEqual(len(get_collections_with_game('user', 1)), 23)
+        self.assertEqual(len(self.statements), 1)
+
+    def test_recent_messages(self):
+        messages = get_recent_messages('chat', 6)
+        self.assertEqual([m.message for m in messages], ['44', '45', '46', '47', '48', '49'])
+        self.assertEqual(len(self.statements), 1)
+
+    def test_recent_messages_short_chat(self):
+        self.assertEqual(len(get_recent_messages('chat', 100)), 50)
+        self.assertEqual(get_recent_messages('nothing', 6), [])
+
+    # walking the pages from the latest returns every message once
+    def test_message_pages(self):
+        pages = []
+        before = None
+        while True:
+            messages, more = get_message_page('chat', 20, before)
+            pages.append([m.message for m in messages])
+            if not more:
+                break
+            before = decode_message_cursor(message_cursor(messages[0]))
+        self.assertEqual([len(page) for page in pages], [20, 20, 10])
+        self.assertEqual(pages[0][-1], '49')
+        self.assertEqual(sum(reversed(pages), []), [str(i) for i in range(50)])
+
+    # messages sharing a date are ordered by id
+    def test_message_pages_same_date(self):
+        date = datetime(2025, 1, 1)
+        db.session.add_all([ChatMessage(public_id = 'same_' + str(i), chat_id = 'chat', is_human = True, date = date, message = 'same ' + str(i)) for i in range(3)])
+        db.session.commit()
+        first, more = get_message_page('chat', 2)
+        self.assertEqual([m.message for m in first], ['same 1', 'same 2'])
+        second, more = get_message_page('chat', 2, decode_message_cursor(message_cursor(first[0])))
+        self.assertEqual([m.message for m in second], ['49', 'same 0'])
+        self.assertTrue(more)
+
+    def test_history_pages(self):
+        for c in range(4):
+            db.session.add(ChatHistory(public_id = 'chat_' + str(c), name = 'chat ' + str(c), game = 1, user_id = 'user'))
+        db.session.commit()
+        first, more = get_history_page('user', 3)
+        self.assertEqual([h.name for h in first], ['chat 3', 'chat 2', 'chat 1'])
+        self.assertTrue(more)
+        second, more = get_history_page('user', 3, decode_history_cursor(history_cursor(first[-1])))
+        self.assertEqual([h.name for h in second], ['chat 0', 'chat'])
+        self.assertFalse(more)
+
+    def test_invalid_cursors(self):
+        self.assertEqual(decode_message_cursor(None), None)
+        self.assertEqual(decode_history_cursor(''), None)
+        for token in ['test', history_cursor(ChatHistory(id = 1))]:
+            with self.assertRaises(ValueError):
+                decode_message_cursor(token)
+        with self.assertRaises(ValueError):
+            decode_history_cursor('test')
+
+    def test_add_collection_items(self):
+        items = add_collection_items('second', [9, '10', 11, 10, 'test', True])
+        db.session.commit()
+        self.assertEqual(items, [
+            {'bg_id': 9, 'status': 'duplicate'},
+            {'bg_id': 10, 'status': 'added'},
+            {'bg_id': 11, 'status': 'added'},
+            {'bg_id': 10, 'status': 'duplicate'},
+            {'bg_id': 'test', 'status': 'invalid'},
+            {'bg_id': True, 'status': 'invalid'},
+        ])
+        bg_ids = [item.bg_id for item in CollectionItem.query.filter_by(collection_id = 'second').all()]
+        self.assertEqual(sorted(bg_ids), [9, 10, 11])
+
+    # one select for the duplicates and one insert, however many games
+    def test_add_collection_items_query_count(self):
+        add_collection_items('empty', list(range(200)))
+        self.assertEqual(len(self.statements), 2)
+        db.session.commit()
+        self.assertEqual(CollectionItem.query.filter_by(collection_id = 'empty').count(), 200)
+
+    def test_remove_collection_items(self):
+        self.statements = []
+        items = remove_collection_items('first', [1, 2, 2, 7, 'test'])
+        db.session.commit()
+        self.assertEqual(items, [
+            {'bg_id': 1, 'status': 'removed'},
+            {'bg_id': 2, 'status': 'removed'},
+            {'bg_id': 2, 'status': 'not_found'},
+            {'bg_id': 7, 'status': 'not_found'},
+            {'bg_id': 'test', 'status': 'invalid'},
+        ])
+        self.assertEqual(len([s for s in self.statements if not s.startswith('COMMIT')]), 2)
+        bg_ids = [item.bg_id for item in CollectionItem.query.filter_by(collection_id = 'first').all()]
+        self.assertEqual(sorted(bg_ids), [3, 4, 5])
+        # the same game of another collection is untouched
+        self.assertEqual(CollectionItem.query.filter_by(collection_id = 'foreign').count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from rag_pool import RetrieverPool
+
+class testRetrieverPool(unittest.TestCase):
+    def setUp(self):
+        self.built = []
+        self.pool = RetrieverPool(self.factory, max_size=2)
+
+    def factory(self, collection_name):
+        self.built.append(collection_name)
+        return 'retriever ' + collection_name
+
+    def test_reuse(self):
+        self.assertEqual(self.pool.get('uno'), 'retriever uno')
+        self.assertEqual(self.pool.get('uno'), 'retriever uno')
+        self.assertEqual(self.built, ['uno'])
+        self.assertEqual(self.pool.stats()['hits'], 1)
+        self.assertEqual(self.pool.stats()['misses'], 1)
+
+    def test_lru_eviction(self):
+        self.pool.get('uno')
+        self.pool.get('splendor')
+        self.pool.get('uno')
+        self.pool.get('terraforming')
+        self.assertTrue('uno' in self.pool)
+        self.assertFalse('splendor' in self.pool)
+        self.assertEqual(self.pool.stats()['evictions'], 1)
+
+    def test_warm_up(self):
+        self.pool.warm_up(['uno', 'splendor'])
+        self.pool.get('splendor')
+        self.assertEqual(self.built, ['uno', 'splendor'])
+
+    def test_evict(self):
+        self.pool.get('uno')
+        self.pool.evict('uno')
+        self.pool.get('uno')
+        self.assertEqual(self.built, ['uno', 'uno'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+
+from search_cache import SearchCache, SharedGeneration, LocalStore, search_cache_key
+
+# a shared store whose server went away
+class storeError(Exception):
+    pass
+
+class brokenStore:
+    def get(self, name):
+        raise storeError()
+
+    def set(self, name, value, ex=None):
+        raise storeError()
+
+    def incr(self, name):
+        raise storeError()
+
+query = {'bool': {'must': [{'match_all': {}}], 'filter': [{'range': {'age': {'gte': '6'}}}]}}
+
+class testSearchCache(unittest.TestCase):
+    def test_key_canonical(self):
+        first = search_cache_key(query, 'brass', 0, 32, {'source': {'includes': ['id', 'name']}})
+        second = search_cache_key({'bool': {'filter': [{'range': {'age': {'gte': '6'}}}], 'must': [{'match_all': {}}]}}, 'brass', 0, 32, {'source': {'includes': ['id', 'name']}})
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, search_cache_key(query, 'brass', 32, 32, {}))
+
+    def test_hit(self):
+        cache = SearchCache(ttl=60)
+        self.assertEqual(cache.get('key'), None)
+        cache.set('key', {'total_hit': 1})
+        self.assertEqual(cache.get('key'), {'total_hit': 1})
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_ttl(self):
+        cache = SearchCache(ttl=0)
+        cache.set('key', {'total_hit': 1})
+        self.assertEqual(cache.get('key'), None)
+
+    def test_max_size(self):
+        cache = SearchCache(ttl=60, max_size=1)
+        cache.set('first', {'total_hit': 1})
+        cache.set('second', {'total_hit': 2})
+        self.assertEqual(cache.get('first'), None)
+
+    def test_invalidate(self):
+        cache = SearchCache(ttl=60)
+        cache.set('key', {'total_hit': 1})
+        cache.invalidate()
+        self.assertEqual(cache.get('key'), None)
+
+    def test_shared_store(self):
+        store = LocalStore()
+        first = SearchCache(ttl=60, store=store, generation_check=0)
+        second = SearchCache(ttl=60, store=store, generation_check=0)
+        first.set('key', {'total_hit': 1})
+        self.assertEqual(second.get('key'), {'total_hit': 1})
+        self.assertEqual(second.stats()['store_hits'], 1)
+
+    def test_shared_invalidate(self):
+        store = LocalStore()
+        first = SearchCache(ttl=60, store=store, generation_check=0)
+        second = SearchCache(ttl=60, store=store, generation_check=0)
+        second.set('key', {'total_hit': 1})
+        self.assertEqual(second.get('key'), {'total_hit': 1})
+        first.invalidate()
+        self.assertEqual(second.get('key'), None)
+
+    # the store failing is a miss, the local entries keep working
+    def test_store_errors(self):
+        cache = SearchCache(ttl=60, store=brokenStore(), generation_check=0, store_errors=(storeError,))
+        self.assertEqual(cache.get('key'), None)
+        cache.set('key', {'total_hit': 1})
+        self.assertEqual(cache.get('key'), {'total_hit': 1})
+        cache.invalidate()
+        self.assertEqual(cache.get('key'), None)
+        self.assertEqual(cache.stats()['generation'], 1)
+
+    def test_store_errors_not_listed(self):
+        cache = SearchCache(ttl=60, store=brokenStore(), generation_check=0)
+        with self.assertRaises(storeError):
+            cache.get('key')
+
+# how the workers of app.py learn that the catalog must be reloaded
+class testSharedGeneration(unittest.TestCase):
+    def test_local(self):
+        generation = SharedGeneration(None, 'catalog:generation')
+        self.assertEqual(generation.current(), 0)
+        self.assertEqual(generation.bump(), 1)
+        self.assertEqual(generation.current(), 1)
+
+    def test_shared(self):
+        store = LocalStore()
+        first = SharedGeneration(store, 'catalog:generation', check=0)
+        second = SharedGeneration(store, 'catalog:generation', check=0)
+        self.assertEqual(second.current(), 0)
+        first.bump()
+        self.assertEqual(second.current(), 1)
+
+    # the store is read at most every check seconds
+    def test_check_interval(self):
+        store = LocalStore()
+        first = SharedGeneration(store, 'catalog:generation')
+        second = SharedGeneration(store, 'catalog:generation', check=60)
+        second.current()
+        first.bump()
+        self.assertEqual(second.current(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from search_cursor import encode_cursor, decode_cursor, build_cursor_args, next_cursor
+
+class testSearchCursor(unittest.TestCase):
+    def test_round_trip(self):
+        token = encode_cursor('pit==', [12.5, 42])
+        self.assertEqual(decode_cursor(token), ('pit==', [12.5, 42]))
+
+    def test_first_page(self):
+        self.assertEqual(decode_cursor(''), (None, None))
+        self.assertEqual(decode_cursor(None), (None, None))
+
+    def test_invalid(self):
+        for token in ['test', encode_cursor('pit', [1])[:-4] + '!!!!', 'eyJwaXQiOjF9']:
+            with self.assertRaises(ValueError):
+                decode_cursor(token)
+
+    def test_cursor_args(self):
+        self.assertEqual(build_cursor_args('pit', None), {
+            'pit': {'id': 'pit', 'keep_alive': '5m'},
+            'sort': [{'_score': 'desc'}, {'_shard_doc': 'asc'}]
+        })
+        self.assertEqual(build_cursor_args('pit', [1.0, 7])['search_after'], [1.0, 7])
+
+    def test_next_cursor(self):
+        hits = [{'sort': [2.0, 1]}, {'sort': [1.0, 5]}]
+        self.assertEqual(decode_cursor(next_cursor('pit', hits, 2)), ('pit', [1.0, 5]))
+        self.assertEqual(next_cursor('pit', hits, 3), None)
+        self.assertEqual(next_cursor('pit', [], 2), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from search_projection import parse_fields, build_source, project_hits
+
+columns = ['id', 'name', 'description', 'image', 'thumbnail']
+
+class testSearchProjection(unittest.TestCase):
+    def test_parse_fields_none(self):
+        self.assertEqual(parse_fields(None, columns), None)
+        self.assertEqual(parse_fields('', columns), None)
+
+    # the description is only left out when fields= does not list it
+    def test_parse_fields_description(self):
+        self.assertEqual(parse_fields('name,description', columns), ['name', 'description'])
+
+    def test_parse_fields_list(self):
+        self.assertEqual(parse_fields('id,name, image,thumbnail', columns), ['id', 'name', 'image', 'thumbnail'])
+
+    def test_parse_fields_unknown_and_duplicate(self):
+        self.assertEqual(parse_fields('name,test,name', columns), ['name'])
+        self.assertEqual(parse_fields('test', columns), None)
+
+    def test_build_source(self):
+        self.assertEqual(build_source(None), None)
+        self.assertEqual(build_source(['id', 'name']), {'includes': ['id', 'name']})
+
+    def test_project_hits(self):
+        hits = [{'_id': 'a', '_score': 2.5, '_source': {'name': 'Brass', 'id': 224517}}]
+        self.assertEqual(project_hits(hits, ['id', 'name', 'image']), [
+            {'id': 224517, 'name': 'Brass', 'image': None, '_score': 2.5}
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
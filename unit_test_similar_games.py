@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from catalog import GameCatalog
+from similar_games import build_similar_games, load_similar_games, similar_hits
+
+class fakeEsClient:
+    def __init__(self, similar, failing=()):
+        self.similar = similar
+        self.failing = failing
+        self.calls = []
+
+    def msearch(self, searches):
+        self.calls.append(searches)
+        responses = []
+        for body in searches[1::2]:
+            bg_id = body['query']['bool']['must_not']['term']['id']
+            if bg_id in self.failing:
+                responses.append({'error': {'type': 'search_phase_execution_exception'}, 'status': 500})
+                continue
+            hits = [{'_score': 10.0 - i, '_source': {'id': str(similar_id)}} for i, similar_id in enumerate(self.similar[bg_id])]
+            responses.append({'hits': {'hits': hits[:body['size']]}})
+        return {'responses': responses}
+
+def make_catalog():
+    return GameCatalog(pd.DataFrame({
+        'id': ['1', '2', '3'],
+        'name': ['Catan', 'Carcassonne', 'Azul'],
+        'description': ['trade', 'tiles', 'tiles'],
+        'categories': ['Economic', 'Tile', 'Abstract'],
+        'mechanics': ['Trading', 'Tile Placement', 'Pattern Building']
+    }))
+
+class testSimilarGames(unittest.TestCase):
+    def test_build(self):
+        es_client = fakeEsClient({1: [2, 3], 2: [3], 3: []})
+        similar_games = build_similar_games(es_client, make_catalog(), k=2, batch=2)
+        # 3 games in batches of 2
+        self.assertEqual(len(es_client.calls), 2)
+        self.assertEqual(similar_games.get(1), [(2, 10.0), (3, 9.0)])
+        self.assertEqual(similar_games.get('2'), [(3, 10.0)])
+        self.assertEqual(similar_games.get(3), [])
+        self.assertEqual(similar_games.get(4), None)
+
+    # a failed search is not saved as "no similar games", the route falls back
+    def test_build_error(self):
+        catalog = make_catalog()
+        similar_games = build_similar_games(fakeEsClient({1: [2], 2: [1], 3: [1]}, failing=[2]), catalog, k=1)
+        self.assertEqual(similar_games.get(2), None)
+        self.assertEqual(similar_games.get(3), [(1, 10.0)])
+        self.assertEqual(similar_hits(similar_games, catalog, 2), None)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'similar_games.npz')
+            similar_games.save(path)
+            self.assertEqual(load_similar_games(path, catalog).get(2), None)
+
+    def test_save_load(self):
+        catalog = make_catalog()
+        similar_games = build_similar_games(fakeEsClient({1: [2], 2: [1], 3: [1]}), catalog, k=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'similar_games.npz')
+            self.assertEqual(load_similar_games(path, catalog), None)
+            similar_games.save(path)
+            self.assertEqual(load_similar_games(path, catalog).get(3), [(1, 10.0)])
+            # built for another catalog
+            other = GameCatalog(pd.DataFrame({'id': ['1', '2']}))
+            self.assertEqual(load_similar_games(path, other), None)
+
+    def test_hits(self):
+        catalog = make_catalog()
+        similar_games = build_similar_games(fakeEsClient({1: [2], 2: [5], 3: [1]}), catalog, k=1)
+        hits = similar_hits(similar_games, catalog, 1)
+        self.assertEqual(hits[0]['_score'], 10.0)
+        self.assertEqual(hits[0]['_id'], '2')
+        self.assertEqual(hits[0]['_source']['name'], 'Carcassonne')
+        # unknown game or similar game, falls back to the live query
+        self.assertEqual(similar_hits(similar_games, catalog, 4), None)
+        self.assertEqual(similar_hits(similar_games, catalog, 2), None)
+        self.assertEqual(similar_hits(None, catalog, 1), None)
+
+if __name__ == '__main__':
+    unittest.main()